@@ -1,8 +1,138 @@
-import os 
-direcs = [d_ for d_ in os.listdir("crab_projects")]
-for d in direcs:
-    print("===============================================================================")
-    c = "crab status -d crab_projects/%s"%(d)
-    print("$",c)
-    os.system(c)
-    print("===============================================================================")
+"""
+18 October 2026
+
+The purpose of this module is to summarize the status of the CRAB tasks in crab_projects in one table: "crab status" is run
+for several tasks at the same time, and the number of jobs in each state is parsed from its output. Results are cached in a
+JSON file: finished tasks are not queried again, and the other tasks only once their cached result is older than --ttl seconds.
+
+Example usage:
+python3 CheckCrabStatus.py
+python3 CheckCrabStatus.py --ttl 0 --verbose # query all unfinished tasks and print the crab status outputs
+python3 CheckCrabStatus.py --statusCommand "cat {directory}/status.txt" # test with saved crab status outputs
+"""
+
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+JOB_STATES = ["idle", "unsubmitted", "cooloff", "transferring", "running", "toRetry", "finished", "failed", "killed"]
+FINISHED_STATUS = "COMPLETED"
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projectsDir", type = str, default = "crab_projects", help = "Directory of the CRAB project directories")
+    parser.add_argument("--nWorkers", type = int, default = 8, help = "Number of crab status commands run at the same time")
+    parser.add_argument("--ttl", type = float, default = 600., help = "Seconds during which the cached status of an unfinished task is used")
+    parser.add_argument("--cacheFile", type = str, default = None, help = "JSON cache of the task statuses (default: <projectsDir>/StatusCache.json)")
+    parser.add_argument("--statusCommand", type = str, default = "crab status -d {directory}", help = "Status command, {directory} is replaced by the project directory")
+    parser.add_argument("--timeout", type = float, default = 300., help = "Seconds after which a status command is stopped")
+    parser.add_argument("--verbose", action = "store_true", help = "Print the output of the status commands run")
+    return parser.parse_args()
+
+##-- Task name, server / scheduler statuses and number of jobs per state from the output of crab status
+def ParseCrabStatus(output):
+    status = {"taskName" : None, "serverStatus" : None, "schedulerStatus" : None, "jobs" : {}, "N_jobs" : 0}
+    inJobs = False
+    for line in output.splitlines():
+        if(line.startswith("Task name:")):
+            status["taskName"] = line.split(":", 1)[1].strip()
+        elif(line.startswith("Status on the CRAB server:")):
+            status["serverStatus"] = line.split(":", 1)[1].strip()
+        elif(line.startswith("Status on the scheduler:")):
+            status["schedulerStatus"] = line.split(":", 1)[1].strip()
+        match = re.match(r"^(Jobs status:)?\s+(\w+)\s+[\d.]+%\s*\(\s*(\d+)\s*/\s*(\d+)\s*\)", line)
+        if(match and (match.group(1) or inJobs)):
+            status["jobs"][match.group(2)] = int(match.group(3))
+            status["N_jobs"] = int(match.group(4))
+            inJobs = True
+        elif(line.strip() != ""):
+            inJobs = False
+    return status
+
+def IsFinished(status):
+    return status.get("schedulerStatus") == FINISHED_STATUS or (status.get("N_jobs", 0) > 0 and status["jobs"].get("finished", 0) == status["N_jobs"])
+
+def QueryStatus(directory, statusCommand, timeout):
+    command = shlex.split(statusCommand.format(directory = directory))
+    try:
+        process = subprocess.run(command, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, universal_newlines = True, timeout = timeout)
+        output, returnCode = process.stdout, process.returncode
+    except (OSError, subprocess.TimeoutExpired) as e:
+        output, returnCode = "%s: %s"%(type(e).__name__, e), -1
+    status = ParseCrabStatus(output)
+    status.update({"directory" : directory, "time" : time.time(), "returnCode" : returnCode, "output" : output})
+    if(returnCode != 0 or status["schedulerStatus"] is None):
+        status["error"] = output.strip().splitlines()[-1] if output.strip() != "" else "return code %s"%(returnCode)
+    return status
+
+def ReadCache(cacheFile):
+    if(not os.path.isfile(cacheFile)):
+        return {}
+    with open(cacheFile) as f:
+        return json.load(f)
+
+##-- Written to a temporary file first, so that an interrupted write does not lose the cache
+def WriteCache(cache, cacheFile):
+    tmpFile = "%s.tmp%s"%(cacheFile, os.getpid())
+    with open(tmpFile, "w") as f:
+        json.dump(cache, f, indent = 2, sort_keys = True)
+    os.replace(tmpFile, cacheFile)
+
+##-- Cached status of each task, after querying the unfinished tasks whose cached status is missing or older than ttl
+def CollectStatuses(directories, cache, statusCommand, ttl, nWorkers, timeout, verbose = False):
+    now = time.time()
+    toQuery = [directory for directory in directories if directory not in cache or "error" in cache[directory]
+               or (not IsFinished(cache[directory]) and now - cache[directory]["time"] > ttl)]
+    print("%s tasks: %s to query, %s from the cache"%(len(directories), len(toQuery), len(directories) - len(toQuery)))
+
+    with ThreadPoolExecutor(max_workers = max(1, min(nWorkers, len(toQuery)))) as executor:
+        futures = [executor.submit(QueryStatus, directory, statusCommand, timeout) for directory in toQuery]
+        for future in as_completed(futures):
+            status = future.result()
+            if(verbose):
+                print("===============================================================================")
+                print("$", statusCommand.format(directory = status["directory"]))
+                print(status["output"])
+            previous = cache.get(status["directory"], {"error" : None})
+            if("error" in status and "error" not in previous): # keep the last known job counts, their age shows they are not updated
+                print("WARNING: crab status failed for %s, using the status of %.0fs ago: %s"%(status["directory"], time.time() - previous["time"], status["error"]))
+                continue
+            cache[status["directory"]] = status
+    return {directory : cache[directory] for directory in directories}
+
+def PrintStatusTable(statuses):
+    states = [state for state in JOB_STATES if any(state in status["jobs"] for status in statuses.values())]
+    states += sorted(set(state for status in statuses.values() for state in status["jobs"]) - set(states))
+    nameWidth = max([len("task")] + [len(os.path.basename(directory)) for directory in statuses])
+    header = "%-*s %-12s %6s"%(nameWidth, "task", "scheduler", "jobs") + "".join(" %12s"%(state) for state in states) + " %8s %8s"%("done", "age")
+    print(header)
+    print("-" * len(header))
+    totals = {state : 0 for state in states}
+    for directory, status in sorted(statuses.items()):
+        age = "%.0fs"%(time.time() - status["time"])
+        if("error" in status):
+            print("%-*s %-12s %s"%(nameWidth, os.path.basename(directory), "ERROR", status["error"]))
+            continue
+        done = 100. * status["jobs"].get("finished", 0) / status["N_jobs"] if status["N_jobs"] > 0 else 0.
+        print("%-*s %-12s %6s"%(nameWidth, os.path.basename(directory), status["schedulerStatus"], status["N_jobs"])
+              + "".join(" %12s"%(status["jobs"].get(state, "")) for state in states) + " %7.1f%% %8s"%(done, age))
+        for state in states:
+            totals[state] += status["jobs"].get(state, 0)
+    N_jobs = sum(totals.values())
+    print("-" * len(header))
+    print("%-*s %-12s %6s"%(nameWidth, "total", "%s/%s done"%(sum(IsFinished(status) for status in statuses.values()), len(statuses)), N_jobs)
+          + "".join(" %12s"%(totals[state]) for state in states) + " %7.1f%%"%(100. * totals.get("finished", 0) / N_jobs if N_jobs > 0 else 0.))
+
+if(__name__ == '__main__'):
+    args = GetOptions()
+    cacheFile = args.cacheFile if args.cacheFile is not None else os.path.join(args.projectsDir, "StatusCache.json")
+    directories = sorted(os.path.join(args.projectsDir, d_) for d_ in os.listdir(args.projectsDir) if os.path.isdir(os.path.join(args.projectsDir, d_)))
+    cache = ReadCache(cacheFile)
+    statuses = CollectStatuses(directories, cache, args.statusCommand, args.ttl, args.nWorkers, args.timeout, args.verbose)
+    WriteCache(cache, cacheFile)
+    PrintStatusTable(statuses)
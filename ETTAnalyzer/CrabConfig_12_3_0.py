@@ -6,7 +6,7 @@ Abraham Tishelman-Charny
 The purpose of this crab configuration file is to run the ETTAnalyzer over many CMSSW data files in parallel. 
 crab submit -c CrabConfig_12_1_0_pre3.py 
 
-IMPORTANT: must be run with submit_crab.sh or delay scan lines must be commented
+IMPORTANT: run with SubmitDelayScan.py (one task per delay), or set the DELAY environment variable before crab submit
 """
 # import os
 # Choose dataset to re-emulate:
@@ -74,19 +74,23 @@ print("Adding CMS files...")
 
 #              CMS_files.append("root://xrootd-cms.infn.it/" + file_path)
 
-# Delay scans : only one delay at a time or all using a bash script
-# delay = -6
+# Delay scans: one config per delay, built by MakeConfig(delay). SubmitDelayScan.py submits all delays, "crab submit" of this
+# file reads the delay from the DELAY environment variable
 import os
-delay = int(os.environ["DELAY"])
-
-
-text_file_path = "Scan_files/Scan_delay_%s.txt"%(delay)
-with open(text_file_path) as f:
-    content = f.readlines()
-    content = [x.strip() for x in content] 
-    for file in content:
-        CMS_files.append("root://xrootd-cms.infn.it/" + file)
-        # CMS_files.append(file)
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights"))
+from CondDB_Tools import BuildConditionsSandbox
+
+def GetScanFiles(delay):
+    scanFiles = []
+    text_file_path = "Scan_files/Scan_delay_%s.txt"%(delay)
+    with open(text_file_path) as f:
+        content = f.readlines()
+        content = [x.strip() for x in content] 
+        for file in content:
+            scanFiles.append("root://xrootd-cms.infn.it/" + file)
+            # scanFiles.append(file)
+    return scanFiles
 
 # To get 2018D ZeroBias data files 
 """
@@ -113,92 +117,95 @@ for block_i in range(0, Nblocks):
 
 """
 
-if(oneFile):
-    CMS_files = [CMS_files[0]] # take first file of files list 
-
-print("Number of input files:",len(CMS_files))
-
-# Crab configuration parameters
-from CRABClient.UserUtilities import config
-config = config()
-
-oneFileStr = ""
-if(oneFile): oneFileStr = "_oneFile"
-
-# if(OverrideWeights): '{DatasetLabel}_{ODD_PF_string}_{RecoMethod}_{WeightsWP}ODDweights{oneFileStr}'.format(DatasetLabel=DatasetLabel, ODD_PF_string=ODD_PF_string, RecoMethod=RecoMethod, WeightsWP=WeightsWP, oneFileStr=oneFileStr)
-# else: requestName = '{DatasetLabel}_{RecoMethod}_ReemulateFromGlobalTag{oneFileStr}'.format(DatasetLabel=DatasetLabel, RecoMethod=RecoMethod, oneFileStr=oneFileStr)
-requestName = 'Scan_delay%sns'%(delay)
-
-config.General.requestName = requestName
-config.General.workArea = 'crab_projects'
-config.General.transferOutputs = True # Need this True to transfer output files, at least with eos output.
-config.General.transferLogs = False 
-
-# cmssw configuration file parameters 
-# config.JobType.pyCfgParams = [
-#                                 'OverrideWeights=%s'%(OverrideWeights), # whether or not to override weights from global tag 
-#                                 'UserGlobalTag=%s'%(UserGlobalTag), # global tag 
-#                                 'TPModeSqliteFile=%s'%(TPMode_file), # strip zeroing, with or without ODD PF configs to try: [EcalTPG_TPMode_Run3_zeroingOddPeakFinder.db, EcalTPG_TPMode_Run3_zeroing,db]
-#                                 'OddWeightsGroupSqliteFile=OneEBOneEEset_adding2021Strips.db', # weights group for each strip - defines which set of ODD weights each strip should use 
-#                                 'BarrelOnly=1', # only run over ECAL barrel 
-#                                 'RunETTAnalyzer=1', # run ETTAnalyzer and save output root file 
-#                                 'TPModeTag=%s'%(TPMode_Tag), # TPMode, aka electronics configuration
-#                                 'OddWeightsSqliteFile=MinDelta_%s_OddWeights.db'%(WeightsWP), # Working points to try: [MinDelta_2p5Prime_OddWeights, MinDelta_0p5Prime_OddWeights.db]
-#                                 'RecoMethod=%s'%(RecoMethod), # offline reco methods to try: [Multifit, weights] 
-#                                 'era=%s'%(ERA),
-#                                 'userMaxEvents=1000'
-#                              ] 
-
-config.JobType.pyCfgParams = [
-                                'OverrideWeights=%s'%(OverrideWeights), # whether or not to override weights from global tag 
-                                'UserGlobalTag=%s'%(UserGlobalTag), # global tag 
-                                'TPModeSqliteFile=%s'%(TPMode_file), # strip zeroing, with or without ODD PF configs to try: [EcalTPG_TPMode_Run3_zeroingOddPeakFinder.db, EcalTPG_TPMode_Run3_zeroing,db]
-                                'OddWeightsGroupSqliteFile=weights/output/OneEBOneEEset.db', # weights group for each strip - defines which set of ODD weights each strip should use 
-                                'BarrelOnly=0', # only run over ECAL barrel 
-                                'RunETTAnalyzer=1', # run ETTAnalyzer and save output root file 
-                                'TPModeTag=%s'%(TPMode_Tag), # TPMode, aka electronics configuration
-                                'OddWeightsSqliteFile=ZeroCandidateSet', # Working points to try: [MinDelta_2p5Prime_OddWeights, MinDelta_0p5Prime_OddWeights.db]
-                                'RecoMethod=%s'%(RecoMethod), # offline reco methods to try: [Multifit, weights] 
-                                'era=%s'%(ERA)
-                            ] 
-
-
-config.JobType.pluginName = 'Analysis'
-config.JobType.psetName = '%s/ETTAnalyzer_cfg_12_3_0.py'%(inDir)
-
-# Splitting
-config.Data.splitting = 'FileBased'
-config.Data.unitsPerJob = 1
-
-# Output directory / file naming
-config.Data.outputPrimaryDataset = '%s%s'%(DatasetLabel, oneFileStr)
-
-if(OverrideWeights): outputDatasetTag = 'ETTAnalyzer_CMSSW_12_3_0_DoubleWeights_%sRecoMethod_StripZeroingMode_%s_%sODDweights'%(RecoMethod, ODD_PF_string, WeightsWP) # 3 DOF to vary
-else: outputDatasetTag = 'ETTAnalyzer_CMSSW_12_3_0_DoubleWeights_ReemulateFromGlobalTag'
-config.Data.outputDatasetTag = outputDatasetTag
-config.Data.outLFNDirBase = '/store/user/tdesrous/Scan_delay_%s/'%(delay) 
-config.Data.publication = False 
-
-config.Data.userInputFiles = CMS_files 
-
-# config.Site.whitelist = ['T2_CH_CERN'] ##-- Eventually had to change from 'T2_FR_GRIF_LLR' whitelist to this 
-# config.Site.storageSite = 'T2_CH_CERN'
-config.Site.whitelist = ['T2_FR_GRIF_LLR'] ##-- Eventually had to change from 'T2_FR_GRIF_LLR' whitelist to this 
-config.Site.storageSite = 'T2_FR_GRIF_LLR'
-
-# input files 
-config.JobType.inputFiles = [
-                            # ODD weights working points
-                            '%s/weights/output/MinDelta_2p5Prime_OddWeights.db'%(inDir),
-                            '%s/weights/output/MinDelta_0p5Prime_OddWeights.db'%(inDir),
-
-                            # TPModes
-                            '%s/TPModes/output/EcalTPG_TPMode_Killing.db'%(inDir),
-                            #  '%s/TPModes/output/EcalTPG_TPMode_Run3_zeroingOddPeakFinder.db'%(inDir),
-
-                            # Misc
-                            '%s/weights/output/OneEBOneEEset_adding2021Strips.db'%(inDir), # OddWeightsGroup - defines odd weights to be used by each ECAL strip 
-                            '%s/ConfigParams.py'%(inDir) # To define cmssw config options 
-                            ]    
-
-# print("hostname: " + os.uname()[1])
\ No newline at end of file
+##-- CRAB configuration of one delay. NewConfig creates the empty configuration, CRABClient.UserUtilities.config by default
+def MakeConfig(delay, NewConfig = None):
+    delay_files = CMS_files + GetScanFiles(delay)
+
+    if(oneFile):
+        delay_files = [delay_files[0]] # take first file of files list 
+
+    print("Number of input files:",len(delay_files))
+
+    # Crab configuration parameters
+    if(NewConfig is None):
+        from CRABClient.UserUtilities import config as NewConfig
+    config = NewConfig()
+
+    oneFileStr = ""
+    if(oneFile): oneFileStr = "_oneFile"
+
+    # if(OverrideWeights): '{DatasetLabel}_{ODD_PF_string}_{RecoMethod}_{WeightsWP}ODDweights{oneFileStr}'.format(DatasetLabel=DatasetLabel, ODD_PF_string=ODD_PF_string, RecoMethod=RecoMethod, WeightsWP=WeightsWP, oneFileStr=oneFileStr)
+    # else: requestName = '{DatasetLabel}_{RecoMethod}_ReemulateFromGlobalTag{oneFileStr}'.format(DatasetLabel=DatasetLabel, RecoMethod=RecoMethod, oneFileStr=oneFileStr)
+    requestName = 'Scan_delay%sns'%(delay)
+
+    config.General.requestName = requestName
+    config.General.workArea = 'crab_projects'
+    config.General.transferOutputs = True # Need this True to transfer output files, at least with eos output.
+    config.General.transferLogs = False 
+
+    # cmssw configuration file parameters 
+    # config.JobType.pyCfgParams = [
+    #                                 'OverrideWeights=%s'%(OverrideWeights), # whether or not to override weights from global tag 
+    #                                 'UserGlobalTag=%s'%(UserGlobalTag), # global tag 
+    #                                 'TPModeSqliteFile=%s'%(TPMode_file), # strip zeroing, with or without ODD PF configs to try: [EcalTPG_TPMode_Run3_zeroingOddPeakFinder.db, EcalTPG_TPMode_Run3_zeroing,db]
+    #                                 'OddWeightsGroupSqliteFile=OneEBOneEEset_adding2021Strips.db', # weights group for each strip - defines which set of ODD weights each strip should use 
+    #                                 'BarrelOnly=1', # only run over ECAL barrel 
+    #                                 'RunETTAnalyzer=1', # run ETTAnalyzer and save output root file 
+    #                                 'TPModeTag=%s'%(TPMode_Tag), # TPMode, aka electronics configuration
+    #                                 'OddWeightsSqliteFile=MinDelta_%s_OddWeights.db'%(WeightsWP), # Working points to try: [MinDelta_2p5Prime_OddWeights, MinDelta_0p5Prime_OddWeights.db]
+    #                                 'RecoMethod=%s'%(RecoMethod), # offline reco methods to try: [Multifit, weights] 
+    #                                 'era=%s'%(ERA),
+    #                                 'userMaxEvents=1000'
+    #                              ] 
+
+    config.JobType.pyCfgParams = [
+                                    'OverrideWeights=%s'%(OverrideWeights), # whether or not to override weights from global tag 
+                                    'UserGlobalTag=%s'%(UserGlobalTag), # global tag 
+                                    'TPModeSqliteFile=%s'%(TPMode_file), # strip zeroing, with or without ODD PF configs to try: [EcalTPG_TPMode_Run3_zeroingOddPeakFinder.db, EcalTPG_TPMode_Run3_zeroing,db]
+                                    'OddWeightsGroupSqliteFile=weights/output/OneEBOneEEset.db', # weights group for each strip - defines which set of ODD weights each strip should use 
+                                    'BarrelOnly=0', # only run over ECAL barrel 
+                                    'RunETTAnalyzer=1', # run ETTAnalyzer and save output root file 
+                                    'TPModeTag=%s'%(TPMode_Tag), # TPMode, aka electronics configuration
+                                    'OddWeightsSqliteFile=ZeroCandidateSet', # Working points to try: [MinDelta_2p5Prime_OddWeights, MinDelta_0p5Prime_OddWeights.db]
+                                    'RecoMethod=%s'%(RecoMethod), # offline reco methods to try: [Multifit, weights] 
+                                    'era=%s'%(ERA)
+                                ] 
+
+
+    config.JobType.pluginName = 'Analysis'
+    config.JobType.psetName = '%s/ETTAnalyzer_cfg_12_3_0.py'%(inDir)
+
+    # Splitting
+    config.Data.splitting = 'FileBased'
+    config.Data.unitsPerJob = 1
+
+    # Output directory / file naming
+    config.Data.outputPrimaryDataset = '%s%s'%(DatasetLabel, oneFileStr)
+
+    if(OverrideWeights): outputDatasetTag = 'ETTAnalyzer_CMSSW_12_3_0_DoubleWeights_%sRecoMethod_StripZeroingMode_%s_%sODDweights'%(RecoMethod, ODD_PF_string, WeightsWP) # 3 DOF to vary
+    else: outputDatasetTag = 'ETTAnalyzer_CMSSW_12_3_0_DoubleWeights_ReemulateFromGlobalTag'
+    config.Data.outputDatasetTag = outputDatasetTag
+    config.Data.outLFNDirBase = '/store/user/tdesrous/Scan_delay_%s/'%(delay) 
+    config.Data.publication = False 
+
+    config.Data.userInputFiles = delay_files 
+
+    # config.Site.whitelist = ['T2_CH_CERN'] ##-- Eventually had to change from 'T2_FR_GRIF_LLR' whitelist to this 
+    # config.Site.storageSite = 'T2_CH_CERN'
+    config.Site.whitelist = ['T2_FR_GRIF_LLR'] ##-- Eventually had to change from 'T2_FR_GRIF_LLR' whitelist to this 
+    config.Site.storageSite = 'T2_FR_GRIF_LLR'
+
+    # input files: the conditions SQLite files read with these pyCfgParams, one copy of each in the content-addressed store
+    # (files are named by the hash of their payloads, so duplicated .db files are shipped once), and ConfigParams.py
+    config.JobType.pyCfgParams, conditionsFiles = BuildConditionsSandbox(config.JobType.pyCfgParams, inDir, "%s/ConditionsStore"%(inDir))
+    print("Conditions files:", conditionsFiles)
+    config.JobType.inputFiles = conditionsFiles + [
+                                '%s/ConfigParams.py'%(inDir) # To define cmssw config options 
+                                ]    
+
+    # print("hostname: " + os.uname()[1])
+    return config
+
+##-- crab submit CrabConfig_12_3_0.py reads the config object of this file
+if("DELAY" in os.environ):
+    config = MakeConfig(int(os.environ["DELAY"]))
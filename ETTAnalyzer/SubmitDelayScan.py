@@ -0,0 +1,144 @@
+"""
+18 October 2026
+
+The purpose of this module is to submit the CRAB tasks of a delay scan, one per delay, with the configurations of
+CrabConfig_12_3_0.MakeConfig. Submissions run in a bounded pool of processes and failed submissions are retried with an
+exponential backoff. The task name of each delay is recorded in a state file, so that running the command again only
+submits the delays that are not submitted yet.
+
+Example usage:
+python3 SubmitDelayScan.py # delays -6 to 6
+python3 SubmitDelayScan.py --delays=-2,0,2 --nWorkers 3
+python3 SubmitDelayScan.py --client stub --stubFailureRate 0.3 # test without submitting, with a local stand-in of the CRAB client
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delays", type = str, default = "-6:6", help = "Delays to submit: first:last (included) or a comma separated list")
+    parser.add_argument("--nWorkers", type = int, default = 4, help = "Maximum number of submissions at the same time")
+    parser.add_argument("--maxAttempts", type = int, default = 4, help = "Maximum number of submission attempts per delay")
+    parser.add_argument("--backoff", type = float, default = 30., help = "Seconds to wait before the second attempt, doubled after each failed attempt")
+    parser.add_argument("--stateFile", type = str, default = "crab_projects/DelayScanState.json", help = "JSON file recording the submitted tasks")
+    parser.add_argument("--resubmit", action = "store_true", help = "Submit again the delays already recorded as submitted")
+    parser.add_argument("--client", type = str, default = "crab", choices = ["crab", "stub"], help = "CRAB client used to submit: crab, or stub to test locally")
+    parser.add_argument("--stubFailureRate", type = float, default = 0., help = "Fraction of failed submissions of the stub client")
+    return parser.parse_args()
+
+##-- "-6:6" -> [-6, ..., 6], "-2,0,2" -> [-2, 0, 2]
+def ParseDelays(delays):
+    if(":" in delays):
+        first, last = delays.split(":")
+        return list(range(int(first), int(last) + 1))
+    return [int(delay) for delay in delays.split(",")]
+
+class CrabClient:
+    def NewConfig(self):
+        from CRABClient.UserUtilities import config
+        return config()
+
+    ##-- Returns the task name
+    def Submit(self, config):
+        from CRABAPI.RawCommand import crabCommand
+        result = crabCommand("submit", config = config)
+        return result["uniquerequestname"]
+
+##-- Stand-in for CrabClient: creates the project directory as crab submit does, and fails a fraction of the submissions
+class StubCrabClient:
+    def __init__(self, failureRate = 0.):
+        self.failureRate = failureRate
+
+    def NewConfig(self):
+        return SimpleNamespace(General = SimpleNamespace(), JobType = SimpleNamespace(), Data = SimpleNamespace(), Site = SimpleNamespace())
+
+    def Submit(self, config):
+        time.sleep(random.uniform(0.1, 0.5))
+        if(random.random() < self.failureRate):
+            raise RuntimeError("Stub submission failure")
+        os.makedirs(ProjectDirectory(config), exist_ok = True) # exists already when a delay is resubmitted
+        return "%s:stub_crab_%s"%(time.strftime("%y%m%d_%H%M%S"), config.General.requestName)
+
+def GetClient(client, stubFailureRate):
+    if(client == "stub"):
+        return StubCrabClient(stubFailureRate)
+    return CrabClient()
+
+def ProjectDirectory(config):
+    return os.path.join(config.General.workArea, "crab_%s"%(config.General.requestName))
+
+##-- Build the configuration of one delay and submit it, with up to maxAttempts attempts. Runs in a worker process
+def SubmitDelay(delay, client, stubFailureRate, maxAttempts, backoff):
+    from CrabConfig_12_3_0 import MakeConfig
+    client = GetClient(client, stubFailureRate)
+    config = MakeConfig(delay, client.NewConfig)
+    projectDirectory = ProjectDirectory(config)
+    errors = []
+    for attempt in range(maxAttempts):
+        if(attempt > 0):
+            time.sleep(backoff * 2**(attempt - 1))
+        existed = os.path.isdir(projectDirectory)
+        try:
+            taskName = client.Submit(config)
+            return {"delay" : delay, "status" : "SUBMITTED", "taskName" : taskName, "requestName" : config.General.requestName,
+                    "projectDirectory" : projectDirectory, "attempts" : attempt + 1, "time" : time.strftime("%Y-%m-%d %H:%M:%S")}
+        except Exception as e:
+            errors.append("%s: %s"%(type(e).__name__, e))
+            if(not existed and os.path.isdir(projectDirectory)): # left by the failed attempt, crab submit refuses an existing directory
+                shutil.rmtree(projectDirectory)
+    return {"delay" : delay, "status" : "FAILED", "errors" : errors, "requestName" : config.General.requestName,
+            "attempts" : maxAttempts, "time" : time.strftime("%Y-%m-%d %H:%M:%S")}
+
+def ReadState(stateFile):
+    if(not os.path.isfile(stateFile)):
+        return {}
+    with open(stateFile) as f:
+        return json.load(f)
+
+##-- Written to a temporary file first, so that an interrupted write does not lose the state
+def WriteState(state, stateFile):
+    os.makedirs(os.path.dirname(os.path.abspath(stateFile)), exist_ok = True)
+    tmpFile = "%s.tmp%s"%(stateFile, os.getpid())
+    with open(tmpFile, "w") as f:
+        json.dump(state, f, indent = 2, sort_keys = True)
+    os.replace(tmpFile, stateFile)
+
+def main():
+    args = GetOptions()
+    delays = ParseDelays(args.delays)
+    state = ReadState(args.stateFile)
+    todo = [delay for delay in delays if args.resubmit or state.get(str(delay), {}).get("status") != "SUBMITTED"]
+    print("%s delays, %s already submitted, %s to submit"%(len(delays), len(delays) - len(todo), len(todo)))
+
+    with ProcessPoolExecutor(max_workers = max(1, min(args.nWorkers, len(todo)))) as executor:
+        futures = {executor.submit(SubmitDelay, delay, args.client, args.stubFailureRate, args.maxAttempts, args.backoff) : delay for delay in todo}
+        for future in as_completed(futures):
+            delay = futures[future]
+            try:
+                result = future.result()
+            except Exception as e: # the configuration could not be built
+                result = {"delay" : delay, "status" : "FAILED", "errors" : ["%s: %s"%(type(e).__name__, e)], "attempts" : 0, "time" : time.strftime("%Y-%m-%d %H:%M:%S")}
+            state[str(delay)] = result
+            WriteState(state, args.stateFile)
+            print("Delay %s: %s after %s attempts %s"%(delay, result["status"], result["attempts"], result.get("taskName", result.get("errors", [""])[-1])))
+
+    print("%-8s %-10s %-9s %s"%("delay", "status", "attempts", "task"))
+    for delay in delays:
+        result = state.get(str(delay), {})
+        print("%-8s %-10s %-9s %s"%(delay, result.get("status", "-"), result.get("attempts", "-"), result.get("taskName", "")))
+    failed = [delay for delay in delays if state.get(str(delay), {}).get("status") != "SUBMITTED"]
+    if(len(failed) > 0):
+        print("Delays not submitted: %s. Run again to retry them"%(failed))
+        sys.exit(1)
+    print("DONE")
+
+if(__name__ == '__main__'):
+    main()
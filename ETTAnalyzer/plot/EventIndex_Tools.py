@@ -0,0 +1,125 @@
+"""
+18 October 2026
+
+The purpose of this module is to provide a persistent (runNb, lumiBlock, evtNb) -> (file, entry) index for ETTAnalyzer output files,
+so that a single event can be read without scanning the evtNb branch.
+
+The index is saved as a sidecar file next to the ROOT file (ETTAnalyzer_output.root.evtidx.npz), or in ~/.cache/ETTAnalyzer/EventIndex/
+if the directory of the ROOT file is not writable or the file is remote (root://...), and is rebuilt automatically if the ROOT file
+changes: local files are checked with their size and modification time, remote files with the UUID of the ROOT file.
+
+Example usage:
+
+from EventIndex_Tools import LoadEventIndex, FindEntry, LoadEvent
+index = LoadEventIndex("ETTAnalyzer_output.root")
+f_path, entry = FindEntry(index, 13707)
+event = LoadEvent(f_path, entry, ["ieta", "iphi", "FineGrainBit"])
+"""
+
+import numpy as np
+import uproot
+import hashlib
+import os
+
+TREE_NAME = "tuplizer/ETTAnalyzerTree"
+INDEX_SUFFIX = ".evtidx.npz"
+INDEX_CACHE_DIRECTORY = os.path.expanduser("~/.cache/ETTAnalyzer/EventIndex/")
+
+##-- Size and modification time of the ROOT file, used to detect a stale index. (-1, -1) for files that cannot be stat'ed (e.g. root://)
+def FileSignature(f_path):
+    try:
+        stat = os.stat(f_path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return -1, -1
+
+##-- Local file path, as opposed to a remote URL such as root://eoscms.cern.ch//eos/...
+def IsLocalPath(f_path):
+    return "://" not in f_path
+
+##-- UUID of a ROOT file, from its header: a rewritten file has a new UUID. Used for remote files, which cannot be stat'ed
+def FileUUID(f_path):
+    with uproot.open(f_path) as f:
+        return str(f.file.uuid)
+
+##-- Possible index locations: sidecar next to a local ROOT file first, then the local cache (the only location for remote files)
+def EventIndexPaths(f_path):
+    if(not IsLocalPath(f_path)):
+        pathHash = hashlib.sha1(f_path.encode()).hexdigest()
+        return ["%s/%s%s"%(INDEX_CACHE_DIRECTORY, pathHash, INDEX_SUFFIX)]
+    pathHash = hashlib.sha1(os.path.abspath(f_path).encode()).hexdigest()
+    return ["%s%s"%(f_path, INDEX_SUFFIX), "%s/%s%s"%(INDEX_CACHE_DIRECTORY, pathHash, INDEX_SUFFIX)]
+
+##-- Read the event ID branches once and sort them by (evtNb, runNb, lumiBlock)
+def BuildEventIndex(f_path, treeName = TREE_NAME):
+    t = uproot.open(f_path)[treeName]
+    ids = t.arrays(["runNb", "lumiBlock", "evtNb"], library = "np")
+    order = np.lexsort((ids["lumiBlock"], ids["runNb"], ids["evtNb"])) # last key is the primary one
+    size, mtime = FileSignature(f_path)
+    index = {
+        "fileName" : np.array(f_path),
+        "treeName" : np.array(treeName),
+        "size" : np.array(size, dtype = np.int64),
+        "mtime" : np.array(mtime, dtype = np.int64),
+        "uuid" : np.array(str(t.file.uuid)),
+        "evtNb" : ids["evtNb"][order].astype(np.int64),
+        "runNb" : ids["runNb"][order].astype(np.int64),
+        "lumiBlock" : ids["lumiBlock"][order].astype(np.int64),
+        "entry" : order.astype(np.int64),
+    }
+    return index
+
+##-- Write the index to the first writable location
+def SaveEventIndex(index):
+    for indexPath in EventIndexPaths(str(index["fileName"])):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(indexPath)), exist_ok = True)
+            np.savez(indexPath, **index)
+            return indexPath
+        except OSError:
+            continue
+    print("Could not save event index for %s"%(index["fileName"]))
+    return None
+
+##-- An index is current if it was built from the same tree of the same version of the file
+def IsIndexCurrent(index, f_path, treeName):
+    if(str(index["treeName"]) != treeName):
+        return False
+    if(not IsLocalPath(f_path)):
+        return "uuid" in index and str(index["uuid"]) == FileUUID(f_path)
+    return (int(index["size"]), int(index["mtime"])) == FileSignature(f_path)
+
+##-- Load the index of a file, building and saving it if it does not exist yet or if the file changed since it was built
+def LoadEventIndex(f_path, treeName = TREE_NAME):
+    for indexPath in EventIndexPaths(f_path):
+        if(not os.path.isfile(indexPath)):
+            continue
+        with np.load(indexPath) as saved:
+            index = {key : saved[key] for key in saved.files}
+        if(IsIndexCurrent(index, f_path, treeName)):
+            index["fileName"] = np.array(f_path)
+            return index
+
+    print("Building event index for %s"%(f_path))
+    index = BuildEventIndex(f_path, treeName)
+    SaveEventIndex(index)
+    return index
+
+##-- (file, entry) of an event. runNb and lumiBlock are only needed if evtNb is not unique in the file
+def FindEntry(index, evtNb, runNb = None, lumiBlock = None):
+    first, last = np.searchsorted(index["evtNb"], [evtNb, evtNb + 1])
+    candidates = np.arange(first, last)
+    if(runNb is not None):
+        candidates = candidates[index["runNb"][candidates] == runNb]
+    if(lumiBlock is not None):
+        candidates = candidates[index["lumiBlock"][candidates] == lumiBlock]
+    if(len(candidates) == 0):
+        raise KeyError("Event %s (run %s, lumi block %s) not found in %s"%(evtNb, runNb, lumiBlock, index["fileName"]))
+
+    entry = int(index["entry"][candidates].min()) # first entry, as np.where(evtNb == event)[0][0]
+    return str(index["fileName"]), entry
+
+##-- Read only the baskets of one entry
+def LoadEvent(f_path, entry, branches, treeName = TREE_NAME):
+    t = uproot.open(f_path)[treeName]
+    return t.arrays(branches, entry_start = entry, entry_stop = entry + 1)[0]
@@ -11,200 +11,214 @@ Example usage:
 
 python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one 
 python3 plot/PlotBeamSplashes.py --TPMode KillNTag --Weights 0p5 --year 2022 --beam two
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one --jobs 64 # render plots in 64 processes
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one --Event 13707 # single event, read via the event index
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one --plotRatio --stepSize "200 MB" # tagged fraction vs time, streamed
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one --exportStore # save tower grids locally, later runs read them instead of ROOT while they are up to date
+python3 plot/PlotBeamSplashes.py --all --year 2022 --jobs 8 # every configuration of GetPathDict, configurations sharing a file read it once
 
 """
 
 import uproot 
+import matplotlib
+matplotlib.use("Agg") # non-interactive backend, identical in serial and --jobs mode 
 from matplotlib import pyplot as plt 
 import numpy as np 
 import awkward as ak
 import matplotlib.colors as colors
 import argparse 
+import copy
+import time as timer
+import sys
 import os 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from Plotter_Tools import Add_CMS_Header, GetPathDict
+from Plotter_Tools import Add_CMS_Header, GetPathDict, GetPathGroups, LoadBranches, GetEventIndices, MakeOutputDirectory, RenderTowerMaps, AccumulateTaggedHistograms, TOWER_MAP_STYLES, SAVEFIG_METADATA
+from TowerGrid_Tools import BuildTowerGrids, N_IETA, N_IPHI, IETA_EXTENT, IPHI_EXTENT
+from TowerStore_Tools import TowerStorePath, ExportTowerStore, LoadTowerStore, DEFAULT_STORE_DIRECTORY
+from PlotCache_Tools import MANIFEST_NAME, FileChecksum, PlotKey, LoadPlotManifest, SavePlotManifest, IsPlotCurrent
+from EventIndex_Tools import LoadEventIndex, FindEntry
 
 parser = argparse.ArgumentParser()
 # parser.add_argument("--inFile", type = str, required = True, help = "Input file, should be ETTAnalyzer output file")
-parser.add_argument("--TPMode", type = str, required = True, help = "TPMode during re-emulation (Killing, Tagging, or TagNKill)")
-parser.add_argument("--Weights", type = str, required = True, help = "Weights during re-emulation (deltamin 0p5, or 2p5)")
-# parser.add_argument("--Event", type = int, required = True, help = "Event number to run over")
+parser.add_argument("--TPMode", type = str, default = None, help = "TPMode during re-emulation (Killing, Tagging, or TagNKill). Required unless --all")
+parser.add_argument("--Weights", type = str, default = None, help = "Weights during re-emulation (deltamin 0p5, or 2p5). Required unless --all")
+parser.add_argument("--Event", type = int, default = None, help = "Event number to run over. If not set, run over all events")
+parser.add_argument("--Run", type = int, default = None, help = "Run number of --Event, only needed if the event number is not unique in the file")
 parser.add_argument("--lowEvents", action = "store_true", help = "Run over fewer events")
 parser.add_argument("--verbose", action = "store_true", help = "Print out more things")
 parser.add_argument("--year", type = str, help = "Year of beam splashes")
 parser.add_argument("--beamNumber", type = str, help = "Beam number (one or two)")
-args = parser.parse_args()
-
-f_path_dict = GetPathDict()
-f_path = f_path_dict[args.Weights][args.TPMode][args.beamNumber]
-verbose = args.verbose
-
-f = uproot.open(f_path)
-t = f["tuplizer/ETTAnalyzerTree"]
-
-# extra info if the user wants it 
-if(verbose):
-    print("Available branches:")
-    print(t.keys())
-    print("CMS Event numbers:")
-    print(t['evtNb'].array())
+parser.add_argument("--plotRatio", action = "store_true", help = "Plot the fraction of tagged towers vs rec hit time")
+parser.add_argument("--stepSize", type = str, default = "100 MB", help = "Chunk size used to stream the tree for --plotRatio, as a number of entries or a memory size such as '100 MB'")
+parser.add_argument("--force", action = "store_true", help = "Render all plots, even those already up to date in the plot manifest")
+parser.add_argument("--store", type = str, default = DEFAULT_STORE_DIRECTORY, help = "Directory of local tower grid stores. Tower maps are read from the store of this configuration when it is up to date, otherwise from the ROOT file")
+parser.add_argument("--noStore", action = "store_true", help = "Always read the tower maps from the ROOT file")
+parser.add_argument("--exportStore", action = "store_true", help = "Export the tower grids of this configuration to the --store directory before plotting")
+parser.add_argument("--jobs", type = int, default = 1, help = "Number of processes used to render the tower maps (1: serial). With --all, shared between the input files processed concurrently")
+parser.add_argument("--all", action = "store_true", help = "Process every (Weights, TPMode, beamNumber) configuration of GetPathDict and print one summary")
+
+WWW_DIRECTORY = "/eos/user/a/atishelm/www/EcalL1Optimization/"
+
+##-- Open the ETTAnalyzer tree if it is not open yet. With a cache dict, the tree is opened once per file 
+def GetTree(t, f_path, cache = None):
+    if(t is None and cache is not None):
+        t = cache.get("tree")
+    if(t is None):
+        t = uproot.open(f_path)["tuplizer/ETTAnalyzerTree"]
+    if(cache is not None):
+        cache["tree"] = t
+    return t
+
+##-- Entry of an event in a tower store 
+def GetStoreEntry(store, event, run = None):
+    entries = np.flatnonzero(store["evtNb"] == event)
+    if(run is not None):
+        entries = entries[store["runNb"][entries] == run]
+    if(len(entries) == 0):
+        raise KeyError("Event %s (run %s) not found in tower store"%(event, run))
+    return int(entries[0])
 
 """
 Ratio plot 
 """
 
-bins = np.linspace(-30, 30, 30)
-isWide = 0
-TTF_clean = 1 
-flatten = 1
-log = 0
-plotRatio = 0
-
-event = -1 
-
-if(plotRatio):
-
-    ##-- Overlay two plots and plot ratio 
-    fig, axarr = plt.subplots(2, 
-                                sharex=True, 
-                                gridspec_kw={
-                                    'hspace': 0.15,
-    #                                     'height_ratios': (0.8,0.2)
-                                    'height_ratios': (0.7,0.3)
-                                    }
-                                )          
-
-    fig.set_dpi(100)
-    fig.set_size_inches(8, 6)
-
-    upper = axarr[0] ##-- Upper axis. Will contain two distributions, one for each CMSSW config 
-    lower = axarr[1] ##-- Lower axis. Will contain ratio of two upper distributions 
-    upper.ticklabel_format(style='plain') ##-- Remove scientific notation
-    #             lower.ticklabel_format(style='plain') ##-- Remove scientific notation            
-    upper.grid(True)        
-    lower.grid(True)        
-
-    #         fig, ax = plt.subplots()
-
-    v = "time"
-    variable_values = t[v].array()
-
-    # If looking at a single event
-    Event_index = -1 
-    if(event != -1):
-        Event_index = np.where(t['evtNb'].array() == event)[0][0]
-    #     evtNb_vals_tagged = evtNb_vals[MASK]
-    #     evtNb_vals_tagged = evtNb_vals_tagged[tagged_filter]
-    #     evtNb_vals_all = evtNb_vals[MASK]
-    #     event_mask_all = [val == event for val in evtNb_vals_all]
-    #     event_mask_tagged = [val == event for val in evtNb_vals_tagged]
-    #     variable_values = variable_values[event_mask_all]
-    #     variable_values_tagged = variable_values[event_mask_tagged]
-
-    if(TTF_clean):
-        TTF_values = t["ttFlag"].array()
-
-    if(flatten): 
-        if(Event_index == -1):
-            variable_values = ak.flatten(variable_values)
+RATIO_EXTENSIONS = ["png", "pdf"]
+
+def PlotRatio(t, args, f_path, cache = None):
+
+    bins = np.linspace(-30, 30, 30)
+    isWide = 0
+    TTF_clean = 1 
+    log = 0
+    plotRatio = args.plotRatio
+
+    event = -1 
+    if(args.Event is not None): event = args.Event
+
+    if(plotRatio):
+
+        # Rendered again only if the input file or the plotting parameters changed, as the tower maps 
+        OUT_DIRECTORY_RATIO = "%s/BeamSplash%s_Reemulation_DeltaMin%sWeights_beam%s/%s_Mode/"%(WWW_DIRECTORY, args.year, args.Weights, args.beamNumber, args.TPMode)
+        outName = "%s/TaggedTimesRatio"%(OUT_DIRECTORY_RATIO)
+        manifestPath = "%s/%s"%(OUT_DIRECTORY_RATIO, MANIFEST_NAME)
+        manifest = LoadPlotManifest(manifestPath)
+        parameters = {"plot" : "TaggedTimesRatio", "event" : event, "run" : args.Run, "bins" : bins.tolist(), "TTF_clean" : TTF_clean, "log" : log}
+        key = PlotKey(FileChecksum(f_path), parameters)
+        if(not args.force and IsPlotCurrent(manifest, outName, key, RATIO_EXTENSIONS)):
+            print("Ratio plot up to date: %s"%(outName))
+            return {"N_current" : 1, "N_rendered" : 0}
+
+        ##-- Overlay two plots and plot ratio 
+        fig, axarr = plt.subplots(2, 
+                                    sharex=True, 
+                                    gridspec_kw={
+                                        'hspace': 0.15,
+        #                                     'height_ratios': (0.8,0.2)
+                                        'height_ratios': (0.7,0.3)
+                                        }
+                                    )          
+
+        fig.set_dpi(100)
+        fig.set_size_inches(8, 6)
+
+        upper = axarr[0] ##-- Upper axis. Will contain two distributions, one for each CMSSW config 
+        lower = axarr[1] ##-- Lower axis. Will contain ratio of two upper distributions 
+        upper.ticklabel_format(style='plain') ##-- Remove scientific notation
+        #             lower.ticklabel_format(style='plain') ##-- Remove scientific notation            
+        upper.grid(True)        
+        lower.grid(True)        
+
+        #         fig, ax = plt.subplots()
+
+        # If looking at a single event
+        entry_start, entry_stop = None, None
+        if(event != -1):
+            f_path, Event_index = FindEntry(LoadEventIndex(f_path), event, args.Run)
+            entry_start, entry_stop = Event_index, Event_index + 1
+
+        # Accumulate the All and Tagged histograms chunk by chunk, so that memory does not depend on the number of events
+        # The histograms only depend on the input file: configurations sharing it reuse them 
+        ratioKey = ("ratio", tuple(bins), TTF_clean, entry_start, entry_stop)
+        if(cache is not None and ratioKey in cache):
+            binVals_all, binVals_tagged = cache[ratioKey]
         else:
-            variable_values = variable_values[Event_index]
-        
-        if(TTF_clean):
-            if(Event_index == -1): TTF_values = ak.flatten(TTF_values)
-            else: TTF_values = TTF_values[Event_index]
-            
-    if(TTF_clean):
-        TTF4_Mask = [val != 4 for val in TTF_values]
-        MASK = np.logical_and(True, TTF4_Mask)
-        variable_values = variable_values[MASK]
-        
-        # Data_FGbit_vals = t["FineGrainBit"].array() # if you want to check tagging in data 
-        Data_FGbit_vals = t["rawTPEmulFineGrainBit3"].array() # if you want to check tagging in emulator 
-        if(Event_index == -1):
-            Data_FGbit_vals = ak.flatten(Data_FGbit_vals)
-        else: 
-            Data_FGbit_vals = Data_FGbit_vals[Event_index]
-        Data_FGbit_vals = Data_FGbit_vals[MASK]
-        
-    tagged = [val == 1 for val in Data_FGbit_vals]
-    tagged_filter = np.logical_and(True, tagged)
-    variable_values_tagged = variable_values[tagged_filter]
-
-        
-    # convert values from awkward to numpy array
-    vals_all = []
-    vals_all = np.append(vals_all, np.array(variable_values))
-    vals_tagged = []
-    vals_tagged = np.append(vals_tagged, np.array(variable_values_tagged))
-
-    binVals_all, edges = np.histogram(vals_all, bins = bins) ##-- Make numpy histogram to get histogram height values in order to avoid drawing on pyplot artist
-    binVals_tagged, edges = np.histogram(vals_tagged, bins = bins) ##-- Make numpy histogram to get histogram height values in order to avoid drawing on pyplot artist
-
-    upper.hist(bins[:-1], weights = binVals_all, bins = bins, label = "All")
-    upper.hist(bins[:-1], weights = binVals_tagged, bins = bins, label = "Tagged")
-    # upper.set_yscale('log')    
-
-    ##-- Take ratio 
-    print("Taking ratio...")
-    binvalues1_a = np.array(binVals_all, dtype = float)
-    binvalues2_a = np.array(binVals_tagged, dtype = float)          
-    bin_centers = [ (((float(bins[i+1]) - float(bins[i])) / 2.) + float(bins[i])) for i in range(0, len(bins)-1)]
-
-    ##-- Ratio plot lines 
-    # lower.plot([bins[0],bins[-1]],[1,1],linestyle=':', color = 'black')
-
-    zero_errors = [0 for entry in bin_centers]
-    ratio = np.true_divide(binvalues2_a , binvalues1_a, out = np.zeros_like(binvalues1_a), where = binvalues1_a != 0)    
-
-    lower.errorbar(bin_centers, ratio, xerr = zero_errors , yerr = zero_errors, marker = '.', color = 'black', ls = '')     
-
-    textstr = "\n".join([
-        "Event = %s"%(str(event)),
-    #     r"%s"%(energy_label)
-        #"%s matched TPs"%(TP_type),
-    #             r"Ratio MostlyZeroed$\geq$32 ADC: %s"%(round(Fraction_Tagged_32to256, 4)),
-    #             r"Ratio MostlyZeroed$<$32 ADC: %s"%(round(Fraction_Tagged_1to32, 4))
-    ])
-
-    props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
-    text_x, text_y = 0.025, 0.95
-    if(event != -1):    
-        fig.text(text_x, text_y, textstr, transform=upper.transAxes, fontsize=20,
-                verticalalignment='top', bbox=props)  
-
-    plt.gcf().subplots_adjust(bottom=0.1)
-    plt.gcf().subplots_adjust(left=0.1)
-    lower.set_xlabel("Rec hit time (ns)", fontsize = 15)
-    upper.set_ylabel("Entries", fontsize = 15)
-
-    upperRightText = "Beam Splash 2021"
-    xmin = 0.115
-    Add_CMS_Header(plt, isWide, upper, upperRightText, xmin)
-    yLabel = "Entries"
-    upper.set_ylabel(yLabel, fontsize = 20)
-    lower.set_ylabel("Ratio", fontsize = 20)
-    plt.yticks(fontsize=15)
-    plt.xticks(fontsize=15)
-
-    if(log):
-        upper.set_yscale('log')
-        upper_ymin, upper_ymax = upper.get_ylim()
-        upper.set_ylim(upper_ymin, upper_ymax * 100.)    
-        upper.legend(fontsize = 20, ncol = 2)
+            t = GetTree(t, f_path, cache)
+            binVals_all, binVals_tagged = AccumulateTaggedHistograms(t, "time", bins, args.stepSize, TTF_clean, entry_start, entry_stop)
+            if(cache is not None): cache[ratioKey] = (binVals_all, binVals_tagged)
+
+        upper.hist(bins[:-1], weights = binVals_all, bins = bins, label = "All")
+        upper.hist(bins[:-1], weights = binVals_tagged, bins = bins, label = "Tagged")
+        # upper.set_yscale('log')    
+
+        ##-- Take ratio 
+        print("Taking ratio...")
+        binvalues1_a = np.array(binVals_all, dtype = float)
+        binvalues2_a = np.array(binVals_tagged, dtype = float)          
+        bin_centers = [ (((float(bins[i+1]) - float(bins[i])) / 2.) + float(bins[i])) for i in range(0, len(bins)-1)]
+
+        ##-- Ratio plot lines 
+        # lower.plot([bins[0],bins[-1]],[1,1],linestyle=':', color = 'black')
+
+        zero_errors = [0 for entry in bin_centers]
+        ratio = np.true_divide(binvalues2_a , binvalues1_a, out = np.zeros_like(binvalues1_a), where = binvalues1_a != 0)    
+
+        lower.errorbar(bin_centers, ratio, xerr = zero_errors , yerr = zero_errors, marker = '.', color = 'black', ls = '')     
+
+        textstr = "\n".join([
+            "Event = %s"%(str(event)),
+        #     r"%s"%(energy_label)
+            #"%s matched TPs"%(TP_type),
+        #             r"Ratio MostlyZeroed$\geq$32 ADC: %s"%(round(Fraction_Tagged_32to256, 4)),
+        #             r"Ratio MostlyZeroed$<$32 ADC: %s"%(round(Fraction_Tagged_1to32, 4))
+        ])
+
+        props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
+        text_x, text_y = 0.025, 0.95
+        if(event != -1):    
+            fig.text(text_x, text_y, textstr, transform=upper.transAxes, fontsize=20,
+                    verticalalignment='top', bbox=props)  
+
+        plt.gcf().subplots_adjust(bottom=0.1)
+        plt.gcf().subplots_adjust(left=0.1)
+        lower.set_xlabel("Rec hit time (ns)", fontsize = 15)
+        upper.set_ylabel("Entries", fontsize = 15)
+
+        upperRightText = "Beam Splash 2021"
+        xmin = 0.115
+        Add_CMS_Header(plt, isWide, upper, upperRightText, xmin)
+        yLabel = "Entries"
+        upper.set_ylabel(yLabel, fontsize = 20)
+        lower.set_ylabel("Ratio", fontsize = 20)
         plt.yticks(fontsize=15)
-        plt.xticks(fontsize=15)    
+        plt.xticks(fontsize=15)
 
-    else:
-        upper.legend(fontsize = 20)
+        if(log):
+            upper.set_yscale('log')
+            upper_ymin, upper_ymax = upper.get_ylim()
+            upper.set_ylim(upper_ymin, upper_ymax * 100.)    
+            upper.legend(fontsize = 20, ncol = 2)
+            plt.yticks(fontsize=15)
+            plt.xticks(fontsize=15)    
+
+        else:
+            upper.legend(fontsize = 20)
+
+        upper.tick_params(axis = 'y', labelsize = 12)    
+        lower.set_ylim(0, 1)
+        # plt.show()
+        MakeOutputDirectory(OUT_DIRECTORY_RATIO, "%s/index.php"%(WWW_DIRECTORY))
+        for extension in RATIO_EXTENSIONS:
+            plt.savefig("%s.%s"%(outName, extension))
+        plt.close()  
+
+        manifest = LoadPlotManifest(manifestPath) # may have been updated by another configuration of the same directory 
+        manifest[outName] = key
+        SavePlotManifest(manifestPath, manifest)
+        return {"N_current" : 0, "N_rendered" : 1}
+
+    return {"N_current" : 0, "N_rendered" : 0}
 
-    upper.tick_params(axis = 'y', labelsize = 12)    
-    lower.set_ylim(0, 1)
-    # plt.show()
-    OUT_DIRECTORY_RATIO = "/eos/user/a/atishelm/www/EcalL1Optimization/BeamSplash%s_Reemulation_DeltaMin%sWeights_beam%s/%s_Mode/"%(args.year, args.Weights, args.beamNumber, args.TPMode)
-    plt.savefig("%s/TaggedTimesRatio.png"%(OUT_DIRECTORY_RATIO))
-    plt.savefig("%s/TaggedTimesRatio.pdf"%(OUT_DIRECTORY_RATIO))
-    plt.close()  
 
 """
 Variable plots 
@@ -217,242 +231,190 @@ variables = [
 DATA_VARIABLES = []
 EMU_VARIABLES = []
 
-events = t['evtNb'].array()
-runNumbers = t['runNb'].array()
-lowEvents = args.lowEvents
-
-N_events = len(events)
-for v_to_plot in variables:
-    print("v_to_plot:",v_to_plot)
-    OUT_DIRECTORY = "/eos/user/a/atishelm/www/EcalL1Optimization/BeamSplash%s_Reemulation_DeltaMin%sWeights_beam%s/%s_Mode/%s/"%(args.year, args.Weights, args.beamNumber, args.TPMode, v_to_plot)
-    if(not os.path.isdir(OUT_DIRECTORY)):
-        cmd = "mkdir -p %s"%(OUT_DIRECTORY)
-        print("$ %s"%(cmd))
-        os.system(cmd)
-        cmd_cp = "cp /eos/user/a/atishelm/www/EcalL1Optimization/index.php %s"%(OUT_DIRECTORY)
-        cmd_cp_2 = "cp /eos/user/a/atishelm/www/EcalL1Optimization/index.php %s/../"%(OUT_DIRECTORY)
-        print("$ %s"%(cmd_cp))
-        os.system(cmd_cp)
-        os.system(cmd_cp_2)
-    for ievent, event in enumerate(events):
-        runNumber = runNumbers[ievent]
-        if(ievent%20==0): print("On event %s / %s: %s"%(ievent, N_events, event))
-        if((ievent==1) and (lowEvents)): 
-            print("Leaving early")
-            break 
-
-        # event = args.Event 
-        apply_tagged_filter = 0 
-
-        # Get vals from tree
-        ieta_vals = t["ieta"].array()
-        iphi_vals = t["iphi"].array()
-        time_vals = t["time"].array()
-        TTF_values = t["ttFlag"].array()
-        Data_FGbit_vals = t["FineGrainBit"].array()
-        Data_EmulFGbit_vals = t["rawTPEmulFineGrainBit3"].array()
-
-        exec("v_to_plot_vals = t['%s'].array()"%(v_to_plot))
-
-        # flatten to look at all events, or pick out single event 
-
-        Event_index = -1 
-        if(event != -1):
-            Event_index = np.where(t['evtNb'].array() == event)[0][0]
-            ieta_vals = ieta_vals[Event_index]
-            iphi_vals = iphi_vals[Event_index]
-            time_vals = time_vals[Event_index]
-            TTF_values = TTF_values[Event_index]
-            Data_FGbit_vals = Data_FGbit_vals[Event_index]    
-            Data_EmulFGbit_vals = Data_EmulFGbit_vals[Event_index]
-            v_to_plot_vals = v_to_plot_vals[Event_index]
-        else:
-            ieta_vals = ak.flatten(ieta_vals)
-            iphi_vals = ak.flatten(iphi_vals)
-            time_vals = ak.flatten(time_vals)
-            TTF_values = ak.flatten(TTF_values)
-            Data_FGbit_vals = ak.flatten(Data_FGbit_vals)
-            Data_EmulFGbit_vals = ak.flatten(Data_EmulFGbit_vals)
-            v_to_plot_vals = ak.flatten(v_to_plot_vals)
-
-        # remove TTs with ttflag 4 
-
-        # Define mask 
-        TTF4_notFour = [val != 4 for val in TTF_values]
-        TTF4_Mask = np.logical_and(True, TTF4_notFour)
-        time_notNull = [val != -999 for val in time_vals]
-        time_Mask = np.logical_and(True, time_notNull)
-
-        full_mask = np.logical_and(TTF4_Mask, time_Mask)
-
-        # apply mask 
-        Data_FGbit_vals = Data_FGbit_vals[full_mask]
-        Data_EmulFGbit_vals = Data_EmulFGbit_vals[full_mask]
-        ieta_vals = ieta_vals[full_mask]
-        iphi_vals = iphi_vals[full_mask]
-        time_vals = time_vals[full_mask]
-        v_to_plot_vals = v_to_plot_vals[full_mask]
-
-        # choose tagged definition based on if you're plotting data or emulated quantities 
-
-        # tagged = [val == 1 for val in Data_FGbit_vals] # tagged in data 
-        tagged = [val == 1 for val in Data_EmulFGbit_vals] # tagged in emulator 
-        tagged_filter = np.logical_and(True, tagged)
-
-        if(apply_tagged_filter):
-            ieta_vals_tagged = ieta_vals[tagged_filter]
-            iphi_vals_tagged = iphi_vals[tagged_filter]
-            time_vals_tagged = time_vals[tagged_filter]
-            v_to_plot_vals_tagged = v_to_plot_vals[tagged_filter]
-            
-        else:
-            ieta_vals_tagged = ieta_vals
-            iphi_vals_tagged = iphi_vals
-            time_vals_tagged = time_vals    
-            v_to_plot_vals_tagged = v_to_plot_vals
-
-        # Convert awkward array to numpy array for plotting
-        ieta_vals_tagged_a = []
-        ieta_vals_tagged_a = np.append(ieta_vals_tagged_a, np.array(ieta_vals_tagged))
-
-        iphi_vals_tagged_a = []
-        iphi_vals_tagged_a = np.append(iphi_vals_tagged_a, np.array(iphi_vals_tagged))
-
-        time_vals_tagged_a = []
-        time_vals_tagged_a = np.append(time_vals_tagged_a, np.array(time_vals_tagged))
-
-        v_to_plot_vals_a = []
-        v_to_plot_vals_a = np.append(v_to_plot_vals_a, np.array(v_to_plot_vals_tagged))
-
-        # Make the plot 
-        fig, ax = plt.subplots()
-
-        fig.set_dpi(100)
-        # fig.set_size_inches(8, 6)
-        # fig.set_size_inches(8, 16)
-
-        # print("ieta_vals_tagged_a:",ieta_vals_tagged_a)
-
-        # ieta_vals_tagged_a
-        ieta_vals_tagged_a = [x if x<0 else x-1 for x in ieta_vals_tagged_a]
-        # [x+1 if x >= 45 else x+5 for x in l]
-
-        ### redefine positive ietas just to remove middle column of ieta = 0 
-
-        ieta_bins = np.linspace(-17, 17, 35)
-        iphi_bins = np.linspace(1, 73, 73)
-
-        # ieta_bins = np.linspace(-17, 18, 36)
-        # iphi_bins = np.linspace(1, 74, 74)
-
-        # print("v_to_plot_vals_a:",v_to_plot_vals_a.tolist())
-
-        if(v_to_plot == "twrADC" or v_to_plot == "twrEmul3ADC"):
-            zLabel = "Tower ET [ADC]"
-            vmin, vmax = 0, 256
-            plt.hist2d(iphi_vals_tagged_a, 
-                    ieta_vals_tagged_a, 
-                    weights = v_to_plot_vals_a,
-                    bins = (iphi_bins, ieta_bins), 
-                    cmap = plt.cm.jet,
-                    vmin = vmin,
-                    vmax = vmax,
-                    cmin = 1
-                    )    
-            
-        elif(v_to_plot == "time"):
-            zLabel = "Rec hit time (ns)"
-            vmin, vmax = -25, 10
-            norm = colors.TwoSlopeNorm(vmin=vmin, vcenter=0, vmax=vmax)
-        #     plt.hist2d(ieta_vals_tagged_a, 
-        #                iphi_vals_tagged_a, 
-            plt.hist2d(iphi_vals_tagged_a, 
-                    ieta_vals_tagged_a, 
-            #            weights = time_vals_tagged_a,
-                    weights = v_to_plot_vals_a,
-        #                bins = (ieta_bins, iphi_bins), 
-                    bins = (iphi_bins, ieta_bins), 
-                    cmap=plt.cm.bwr,
-                    vmin = vmin,
-                    vmax = vmax,
-                    norm = norm
-            #            cmin = 1
-                    )    
-
-        elif(v_to_plot == "FineGrainBit" or v_to_plot == "rawTPEmulFineGrainBit3"):
-            zLabel = v_to_plot
-            vmin, vmax = 0, 2
-        #     plt.hist2d(ieta_vals_tagged_a, 
-        #                iphi_vals_tagged_a, 
-            plt.hist2d(iphi_vals_tagged_a, 
-                    ieta_vals_tagged_a, 
-                    weights = v_to_plot_vals_a,
-        #                bins = (ieta_bins, iphi_bins), 
-                    bins = (iphi_bins, ieta_bins), 
-                    cmap = plt.cm.jet,
-                    vmin = vmin,
-                    vmax = vmax,
-                    cmin = 1
-                    )      
-            
-        if(v_to_plot != "FineGrainBit" and v_to_plot != "rawTPEmulFineGrainBit3"):
-            plt.colorbar().set_label(zLabel, fontsize = 20, labelpad = 11)
-
-        # norm = colors.TwoSlopeNorm(vmin=vmin, vcenter=0, vmax=vmax)
-        # plt.pcolor(X, Y, Z, vmin=vmin, vmax=vmax, norm=norm)   
-
-        # plt.colorbar.set_label("Rec hit time (ns)")
-
-        # plt.ylabel(r'Trigger Tower $\phi$ index', fontsize = 22)
-        # plt.xlabel(r'Trigger Tower $\eta$ index', fontsize = 22)
-
-        plt.ylabel(r'Trigger Tower $\eta$ index', fontsize = 22)
-        plt.xlabel(r'Trigger Tower $\phi$ index', fontsize = 22)
-
-        upperRightText = "Beam Splash 2021"
-        # upperRightText = ""
-        # xmin = 0.15
-        # Add_CMS_Header(plt, isWide, ax, upperRightText, xmin)
-        plt.grid()
-        # plt.show()
-
-        plt.xticks(fontsize = 18)
-        plt.yticks(fontsize = 18)
-
-        if(v_to_plot == "FineGrainBit"):
-        #     xmin = 0.12
-            xmin = 0.05
-            plt.text(
-                0.06, 0.9, u"Towers flagged",
-                fontsize=20, fontweight='bold',
-                horizontalalignment='left',
-                verticalalignment='bottom',
-                transform=ax.transAxes
-            )    
-            Add_CMS_Header(plt, isWide, ax, upperRightText, xmin)
-            EB_LABEL_COLOR = "black"
-            fig.set_size_inches(16, 8) # time 
-        else:
-            xmin = 0.06
-            EB_LABEL_COLOR = "w"
-        #     xmin = 0.15
-            fig.set_size_inches(17.5, 8) # time 
-            
-        Add_CMS_Header(plt, isWide, ax, upperRightText, xmin)
-
-        EB_LABEL_XMIN = 0.06
-
-        plt.text(
-        #     EB_LABEL_XMIN, 0.89, u"ECAL Barrel",
-            EB_LABEL_XMIN, 0.95, u"ECAL Barrel",
-            fontsize=20, fontweight='bold',
-            horizontalalignment='left',
-            verticalalignment='bottom',
-            transform=ax.transAxes, color = EB_LABEL_COLOR
-        )     
-
-        fig.tight_layout()
-        plt.savefig("%s/BeamSplash%s_%s_Run%s_Event%s.png"%(OUT_DIRECTORY, args.year, v_to_plot, runNumber, event))
-        plt.savefig("%s/BeamSplash%s_%s_Run%s_Event%s.pdf"%(OUT_DIRECTORY, args.year, v_to_plot, runNumber, event))
-        plt.close()
-print("DONE")
+##-- Render the tower maps of one configuration. cache: dict shared between configurations reading the same file (see ProcessFileGroup) 
+def PlotVariables(t, args, f_path, cache = None):
+
+    # Read every needed branch once per file. Per-event access below only takes views of these arrays
+    # or use the local tower store of this configuration if it is up to date 
+    geometry_branches = ["evtNb", "runNb", "ieta", "iphi", "time", "ttFlag", "FineGrainBit", "rawTPEmulFineGrainBit3"]
+    apply_tagged_filter = 0 
+    store = None
+    if(not args.noStore):
+        store = LoadTowerStore(TowerStorePath(args.store, args.Weights, args.TPMode, args.beamNumber), f_path, variables, apply_tagged_filter)
+
+    entry_start, entry_stop = None, None
+    if(store is not None):
+        print("Reading tower grids from store %s"%(TowerStorePath(args.store, args.Weights, args.TPMode, args.beamNumber)))
+        if(args.Event is not None):
+            entry = GetStoreEntry(store, args.Event, args.Run)
+            entry_start, entry_stop = entry, entry + 1
+        eventIDs = {v : store[v][entry_start:entry_stop] for v in ["evtNb", "runNb"]}
+        inputChecksum = store["meta"]["inputChecksum"]
+    else:
+        if(args.Event is not None):
+            f_path, entry = FindEntry(LoadEventIndex(f_path), args.Event, args.Run)
+            print("Event %s is entry %s of %s"%(args.Event, entry, f_path))
+            entry_start, entry_stop = entry, entry + 1
+        t = GetTree(t, f_path, cache)
+        eventIDs = LoadBranches(t, ["evtNb", "runNb"], entry_start, entry_stop, cache)
+        inputChecksum = FileChecksum(f_path)
+
+    events = eventIDs['evtNb']
+    runNumbers = eventIDs['runNb']
+    EventIndices = GetEventIndices(events)
+    lowEvents = args.lowEvents
+
+    # Create output directories once, before any rendering 
+    MODE_DIRECTORY = "%s/BeamSplash%s_Reemulation_DeltaMin%sWeights_beam%s/%s_Mode/"%(WWW_DIRECTORY, args.year, args.Weights, args.beamNumber, args.TPMode)
+    OUT_DIRECTORIES = {}
+    for v_to_plot in variables:
+        OUT_DIRECTORY = "%s/%s/"%(MODE_DIRECTORY, v_to_plot)
+        MakeOutputDirectory(OUT_DIRECTORY, "%s/index.php"%(WWW_DIRECTORY))
+        OUT_DIRECTORIES[v_to_plot] = OUT_DIRECTORY
+
+    # Only plots whose input file or plotting parameters changed are rendered again 
+    manifestPath = "%s/%s"%(MODE_DIRECTORY, MANIFEST_NAME)
+    manifest = LoadPlotManifest(manifestPath) # also with --force: the entries of the plots not rendered here (ratio plot) are kept 
+
+    # One render task per (variable, event) 
+    planned = {}
+    N_events = len(events)
+    current = set()
+    for v_to_plot in variables:
+        print("v_to_plot:",v_to_plot)
+        OUT_DIRECTORY = OUT_DIRECTORIES[v_to_plot]
+        for ievent, event in enumerate(events):
+            runNumber = runNumbers[ievent]
+            if(ievent%20==0): print("On event %s / %s: %s"%(ievent, N_events, event))
+            if((ievent==1) and (lowEvents)): 
+                print("Leaving early")
+                break 
+
+            outName = "%s/BeamSplash%s_%s_Run%s_Event%s"%(OUT_DIRECTORY, args.year, v_to_plot, runNumber, event)
+            parameters = {
+                "variable" : v_to_plot, "event" : int(event), "run" : int(runNumber), "taggedOnly" : apply_tagged_filter,
+                "binning" : [N_IETA, N_IPHI, IETA_EXTENT, IPHI_EXTENT], "style" : TOWER_MAP_STYLES[v_to_plot]
+            }
+            key = PlotKey(inputChecksum, parameters)
+            if(not args.force and IsPlotCurrent(manifest, outName, key, SAVEFIG_METADATA.keys())):
+                current.add(outName)
+            elif(outName not in planned):
+                planned[outName] = (v_to_plot, EventIndices[event], key)
+
+    print("%s plots up to date, %s to render"%(len(current), len(planned)))
+    stats = {"N_events" : N_events, "N_current" : len(current), "N_rendered" : len(planned)}
+    if(len(planned) == 0):
+        return stats
+
+    # Scatter the towers of all events into (events x ieta x iphi) grids, only for the variables with plots to render 
+    variables_to_render = [v_to_plot for v_to_plot in variables if v_to_plot in set(v for v, _, _ in planned.values())]
+    if(store is not None):
+        grids = {v_to_plot : store[v_to_plot][entry_start:entry_stop] for v_to_plot in variables_to_render}
+    else:
+        # grids already built for another configuration of the same file are reused 
+        grids = {} if cache is None else cache.setdefault(("grids", apply_tagged_filter, entry_start, entry_stop), {})
+        variables_to_build = [v_to_plot for v_to_plot in variables_to_render if v_to_plot not in grids]
+        if(len(variables_to_build) > 0):
+            arrays = LoadBranches(t, geometry_branches + variables_to_build, entry_start, entry_stop, cache)
+            grids.update(BuildTowerGrids(arrays, variables_to_build, taggedOnly = apply_tagged_filter))
+
+    tasks = [(v_to_plot, grids[v_to_plot][Event_index], outName) for outName, (v_to_plot, Event_index, key) in planned.items()]
+    RenderTowerMaps(tasks, args.jobs)
+
+    for outName, (v_to_plot, Event_index, key) in planned.items():
+        manifest[outName] = key
+    SavePlotManifest(manifestPath, manifest)
+    return stats
+
+##-- Export, ratio plot and tower maps of one configuration 
+def ProcessConfiguration(args, f_path, cache = None):
+    verbose = args.verbose
+
+    if(args.exportStore):
+        ExportTowerStore(f_path, TowerStorePath(args.store, args.Weights, args.TPMode, args.beamNumber), variables, step_size = args.stepSize)
+
+    # The ROOT file is only opened if it is needed: not when plotting tower maps from an up to date store, nor for an up to date ratio plot 
+    t = None
+    if(verbose):
+        t = GetTree(t, f_path, cache)
+
+    # extra info if the user wants it 
+    if(verbose):
+        print("Available branches:")
+        print(t.keys())
+        print("CMS Event numbers:")
+        print(t['evtNb'].array())
+
+    ratioStats = PlotRatio(t, args, f_path, cache)
+    stats = PlotVariables(t, args, f_path, cache)
+    stats["N_current"] += ratioStats["N_current"]
+    stats["N_rendered"] += ratioStats["N_rendered"]
+    return stats
+
+##-- All configurations reading one input file, in one process. Branches, grids and ratio histograms are read once and shared 
+def ProcessFileGroup(args, f_path, configurations):
+    cache = {}
+    summary = []
+    for Weights, TPMode, beamNumber in configurations:
+        configArgs = copy.copy(args)
+        configArgs.Weights, configArgs.TPMode, configArgs.beamNumber = Weights, TPMode, beamNumber
+        row = {"Weights" : Weights, "TPMode" : TPMode, "beamNumber" : beamNumber, "f_path" : f_path, "N_events" : 0, "N_current" : 0, "N_rendered" : 0, "status" : "OK"}
+        start = timer.time()
+        try:
+            row.update(ProcessConfiguration(configArgs, f_path, cache))
+        except Exception as e: # one failing configuration does not stop the others 
+            row["status"] = "FAILED: %s: %s"%(type(e).__name__, e)
+        row["seconds"] = timer.time() - start
+        summary.append(row)
+    return summary
+
+##-- Process every configuration of GetPathDict, one file group per worker, and print one summary table 
+def RunAllConfigurations(args):
+    groups = GetPathGroups(GetPathDict())
+    N_workers = max(1, min(args.jobs, len(groups)))
+    args = copy.copy(args)
+    args.jobs = max(1, args.jobs // N_workers) # remaining processes render the tower maps inside each worker 
+    print("Processing %s configurations in %s files with %s workers"%(sum(len(configurations) for configurations in groups.values()), len(groups), N_workers))
+
+    summary = []
+    if(N_workers == 1):
+        for f_path, configurations in groups.items():
+            summary.extend(ProcessFileGroup(args, f_path, configurations))
+    else:
+        with ProcessPoolExecutor(max_workers = N_workers) as executor:
+            futures = [executor.submit(ProcessFileGroup, args, f_path, configurations) for f_path, configurations in groups.items()]
+            for future in as_completed(futures):
+                summary.extend(future.result())
+
+    PrintSummary(summary)
+    return summary
+
+def PrintSummary(summary):
+    summary = sorted(summary, key = lambda row: (row["Weights"], row["TPMode"], row["beamNumber"]))
+    print("")
+    print("%-8s %-10s %-5s %8s %10s %10s %9s  %s"%("Weights", "TPMode", "beam", "events", "up to date", "rendered", "time [s]", "status"))
+    for row in summary:
+        print("%-8s %-10s %-5s %8s %10s %10s %9.1f  %s"%(row["Weights"], row["TPMode"], row["beamNumber"], row["N_events"], row["N_current"], row["N_rendered"], row["seconds"], row["status"]))
+    N_failed = sum(row["status"] != "OK" for row in summary)
+    print("%s configurations, %s failed"%(len(summary), N_failed))
+
+def main():
+    args = parser.parse_args()
+
+    if(args.all):
+        summary = RunAllConfigurations(args)
+        print("DONE")
+        if(any(row["status"] != "OK" for row in summary)):
+            sys.exit(1)
+        return
+
+    if(args.Weights is None or args.TPMode is None):
+        parser.error("--Weights and --TPMode are required unless --all is given")
+
+    f_path_dict = GetPathDict()
+    f_path = f_path_dict[args.Weights][args.TPMode][args.beamNumber]
+    ProcessConfiguration(args, f_path)
+    print("DONE")
+
+if(__name__ == '__main__'):
+    main()
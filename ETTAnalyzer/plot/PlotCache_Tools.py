@@ -0,0 +1,81 @@
+"""
+18 October 2026
+
+The purpose of this module is to skip re-rendering beam splash plots that are already up to date.
+
+Each output directory holds a manifest (plot_manifest.json) mapping every plot to a key computed from the checksum of the input
+ROOT file and the plotting parameters (variable, event, binning, colour map, vmin, vmax). A plot is only rendered again if its key
+changed or one of its files is missing.
+
+Example usage:
+
+from PlotCache_Tools import FileChecksum, LoadPlotManifest, PlotKey, IsPlotCurrent, SavePlotManifest
+manifest = LoadPlotManifest("plot_manifest.json")
+key = PlotKey(FileChecksum("ETTAnalyzer_output.root"), {"variable" : "twrADC", "event" : 13707})
+if(not IsPlotCurrent(manifest, "BeamSplash2022_twrADC_Run350966_Event13707", key, ["png", "pdf"])): ...
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "plot_manifest.json"
+CHECKSUM_CACHE = os.path.expanduser("~/.cache/ETTAnalyzer/checksums.json")
+CHECKSUM_BLOCK_SIZE = 16 * 1024 * 1024
+
+##-- Write json to a temporary file first so that an interrupted run never leaves a truncated file
+def WriteJson(outName, content):
+    os.makedirs(os.path.dirname(os.path.abspath(outName)), exist_ok = True)
+    tmpName = "%s.tmp%s"%(outName, os.getpid())
+    with open(tmpName, "w") as f:
+        json.dump(content, f, indent = 1, sort_keys = True)
+    os.replace(tmpName, outName)
+
+def ReadJson(inName):
+    if(not os.path.isfile(inName)):
+        return {}
+    try:
+        with open(inName) as f:
+            return json.load(f)
+    except ValueError:
+        print("Ignoring unreadable file: %s"%(inName))
+        return {}
+
+##-- sha1 of the file contents. Checksums are remembered per (path, size, mtime), so an unchanged file is only read once
+def FileChecksum(f_path):
+    stat = os.stat(f_path)
+    cacheKey = "%s:%s:%s"%(os.path.abspath(f_path), stat.st_size, stat.st_mtime_ns)
+    checksums = ReadJson(CHECKSUM_CACHE)
+    if(cacheKey in checksums):
+        return checksums[cacheKey]
+
+    print("Computing checksum of %s"%(f_path))
+    sha1 = hashlib.sha1()
+    with open(f_path, "rb") as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b""):
+            sha1.update(block)
+    checksum = sha1.hexdigest()
+
+    checksums[cacheKey] = checksum
+    try:
+        WriteJson(CHECKSUM_CACHE, checksums)
+    except OSError:
+        pass # the checksum is only recomputed next time
+    return checksum
+
+##-- Key of one plot: changes if the input file or any of the plotting parameters change
+def PlotKey(inputChecksum, parameters):
+    content = json.dumps({"input" : inputChecksum, "parameters" : parameters}, sort_keys = True)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+def LoadPlotManifest(manifestPath):
+    return ReadJson(manifestPath)
+
+def SavePlotManifest(manifestPath, manifest):
+    WriteJson(manifestPath, manifest)
+
+##-- A plot is current if the manifest has the same key for it and all of its files exist
+def IsPlotCurrent(manifest, outName, key, extensions):
+    if(manifest.get(outName) != key):
+        return False
+    return all(os.path.isfile("%s.%s"%(outName, extension)) for extension in extensions)
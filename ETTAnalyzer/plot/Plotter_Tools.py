@@ -5,6 +5,41 @@ Abraham Tishelman-Charny
 The purpose of this module is to provide tools for the BeamSplashes_2021 module 
 """
 
+import numpy as np
+import awkward as ak
+from matplotlib import pyplot as plt
+import matplotlib.colors as colors
+from concurrent.futures import ProcessPoolExecutor
+import shutil
+import os
+
+from TowerGrid_Tools import N_IETA, N_IPHI, IETA_EXTENT, IPHI_EXTENT, DisplayGrid
+
+##-- Read all requested branches of an ETTAnalyzer tree in a single pass.
+##-- Indexing the returned array with an entry number gives a view of that event, so per-event plotting does not re-read the file
+##-- entry_start/entry_stop restrict the read to a range of entries, e.g. one event found with EventIndex_Tools.FindEntry
+##-- With a cache dict, branches already read for the same entry range are not read again (e.g. by configurations sharing a file)
+def LoadBranches(t, branches, entry_start = None, entry_stop = None, cache = None):
+    branches = list(dict.fromkeys(branches)) ##-- remove duplicates, keep order
+    if(cache is None):
+        arrays = t.arrays(branches, entry_start = entry_start, entry_stop = entry_stop)
+        return arrays
+
+    cached = cache.setdefault(("branches", entry_start, entry_stop), {})
+    missing = [branch for branch in branches if branch not in cached]
+    if(len(missing) > 0):
+        arrays = t.arrays(missing, entry_start = entry_start, entry_stop = entry_stop)
+        for branch in missing:
+            cached[branch] = arrays[branch]
+    return {branch : cached[branch] for branch in branches}
+
+##-- Map each event number to its first entry in the tree, equivalent to np.where(evtNbs == event)[0][0]
+def GetEventIndices(evtNbs):
+    evtNbs = np.asarray(evtNbs)
+    uniqueEvents, firstIndices = np.unique(evtNbs, return_index = True)
+    EventIndices = dict(zip(uniqueEvents.tolist(), firstIndices.tolist()))
+    return EventIndices
+
 ##-- CMS header 
 def Add_CMS_Header(plt, isWide, ax, upperRightText, xmin):
     ##-- Upper left plot text
@@ -92,4 +127,150 @@ def GetPathDict():
 
     }    
 
-    return f_path_dict
\ No newline at end of file
+    return f_path_dict
+
+##-- Every (Weights, TPMode, beamNumber) configuration of GetPathDict, grouped by input file so that configurations sharing a file read it once
+def GetPathGroups(f_path_dict):
+    groups = {}
+    for Weights, TPModes in f_path_dict.items():
+        for TPMode, beams in TPModes.items():
+            for beamNumber, f_path in beams.items():
+                groups.setdefault(f_path, []).append((Weights, TPMode, beamNumber))
+    return groups
+
+
+##-- Histogram a tower variable for all and for emulator-tagged towers, streaming the tree in chunks of step_size (entries or e.g. "100 MB")
+def AccumulateTaggedHistograms(t, v, bins, step_size, TTF_clean = 1, entry_start = None, entry_stop = None):
+    if(isinstance(step_size, str) and step_size.isdigit()): step_size = int(step_size)
+    binVals_all = np.zeros(len(bins) - 1, dtype = np.int64)
+    binVals_tagged = np.zeros(len(bins) - 1, dtype = np.int64)
+    branches = list(dict.fromkeys([v, "ttFlag", "rawTPEmulFineGrainBit3"]))
+    for chunk in t.iterate(branches, step_size = step_size, entry_start = entry_start, entry_stop = entry_stop):
+        variable_values = np.asarray(ak.flatten(chunk[v]))
+        Data_FGbit_vals = np.asarray(ak.flatten(chunk["rawTPEmulFineGrainBit3"])) # tagging in emulator. Use FineGrainBit to check tagging in data 
+        if(TTF_clean):
+            MASK = np.asarray(ak.flatten(chunk["ttFlag"])) != 4
+            variable_values = variable_values[MASK]
+            Data_FGbit_vals = Data_FGbit_vals[MASK]
+        tagged_filter = Data_FGbit_vals == 1
+        binVals_all += np.histogram(variable_values, bins = bins)[0]
+        binVals_tagged += np.histogram(variable_values[tagged_filter], bins = bins)[0]
+
+    return binVals_all, binVals_tagged
+
+##-- Create an output directory (and copy the www index.php into it and its parent) if it does not exist yet
+def MakeOutputDirectory(OUT_DIRECTORY, indexFile):
+    if(not os.path.isdir(OUT_DIRECTORY)):
+        print("Creating output directory: %s"%(OUT_DIRECTORY))
+        os.makedirs(OUT_DIRECTORY, exist_ok = True)
+        if(os.path.isfile(indexFile)):
+            shutil.copy(indexFile, OUT_DIRECTORY)
+            shutil.copy(indexFile, "%s/../"%(OUT_DIRECTORY))
+
+##-- Fixed metadata so that PDFs are byte-identical between runs (and between serial and --jobs mode)
+SAVEFIG_METADATA = {"png" : None, "pdf" : {"CreationDate" : None}}
+
+##-- Colour scale of each tower map variable. vcenter != None gives a two-slope norm centred on vcenter
+TOWER_MAP_STYLES = {
+    "twrADC" : {"zLabel" : "Tower ET [ADC]", "cmap" : "jet", "vmin" : 0, "vmax" : 256, "vcenter" : None},
+    "twrEmul3ADC" : {"zLabel" : "Tower ET [ADC]", "cmap" : "jet", "vmin" : 0, "vmax" : 256, "vcenter" : None},
+    "time" : {"zLabel" : "Rec hit time (ns)", "cmap" : "bwr", "vmin" : -25, "vmax" : 10, "vcenter" : 0},
+    "FineGrainBit" : {"zLabel" : "FineGrainBit", "cmap" : "jet", "vmin" : 0, "vmax" : 2, "vcenter" : None},
+    "rawTPEmulFineGrainBit3" : {"zLabel" : "rawTPEmulFineGrainBit3", "cmap" : "jet", "vmin" : 0, "vmax" : 2, "vcenter" : None},
+}
+
+##-- One figure per variable and process, reused for every event: only the image data changes between events
+TOWER_MAP_FIGURES = {}
+
+def GetTowerMapFigure(v_to_plot):
+    if(v_to_plot in TOWER_MAP_FIGURES):
+        return TOWER_MAP_FIGURES[v_to_plot]
+
+    isWide = 0
+
+    # Make the plot 
+    fig, ax = plt.subplots()
+    fig.set_dpi(100)
+
+    imshow_args = dict(origin = "lower", extent = IPHI_EXTENT + IETA_EXTENT, aspect = "auto", interpolation = "nearest")
+    emptyGrid = np.full((N_IETA, N_IPHI), np.nan)
+
+    style = TOWER_MAP_STYLES[v_to_plot]
+    zLabel = style["zLabel"]
+    if(style["vcenter"] is None):
+        im = ax.imshow(emptyGrid, cmap = style["cmap"], vmin = style["vmin"], vmax = style["vmax"], **imshow_args)
+    else:
+        norm = colors.TwoSlopeNorm(vmin = style["vmin"], vcenter = style["vcenter"], vmax = style["vmax"]) # vmin and vmax are carried by the norm
+        im = ax.imshow(emptyGrid, cmap = style["cmap"], norm = norm, **imshow_args)
+
+    if(v_to_plot != "FineGrainBit" and v_to_plot != "rawTPEmulFineGrainBit3"):
+        fig.colorbar(im, ax = ax).set_label(zLabel, fontsize = 20, labelpad = 11)
+
+    plt.ylabel(r'Trigger Tower $\eta$ index', fontsize = 22)
+    plt.xlabel(r'Trigger Tower $\phi$ index', fontsize = 22)
+
+    upperRightText = "Beam Splash 2021"
+    plt.grid()
+
+    plt.xticks(fontsize = 18)
+    plt.yticks(fontsize = 18)
+
+    if(v_to_plot == "FineGrainBit"):
+        xmin = 0.05
+        plt.text(
+            0.06, 0.9, u"Towers flagged",
+            fontsize=20, fontweight='bold',
+            horizontalalignment='left',
+            verticalalignment='bottom',
+            transform=ax.transAxes
+        )    
+        Add_CMS_Header(plt, isWide, ax, upperRightText, xmin)
+        EB_LABEL_COLOR = "black"
+        fig.set_size_inches(16, 8) # time 
+    else:
+        xmin = 0.06
+        EB_LABEL_COLOR = "w"
+        fig.set_size_inches(17.5, 8) # time 
+        
+    Add_CMS_Header(plt, isWide, ax, upperRightText, xmin)
+
+    EB_LABEL_XMIN = 0.06
+
+    plt.text(
+        EB_LABEL_XMIN, 0.95, u"ECAL Barrel",
+        fontsize=20, fontweight='bold',
+        horizontalalignment='left',
+        verticalalignment='bottom',
+        transform=ax.transAxes, color = EB_LABEL_COLOR
+    )     
+
+    fig.tight_layout()
+    TOWER_MAP_FIGURES[v_to_plot] = (fig, im)
+
+    return fig, im
+
+##-- Plot one EB tower map. task = (v_to_plot, (34, 72) tower grid from TowerGrid_Tools.BuildTowerGrids, output path without extension)
+def PlotTowerMap(task):
+    v_to_plot, grid, outName = task
+    fig, im = GetTowerMapFigure(v_to_plot)
+    im.set_data(DisplayGrid(grid, v_to_plot))
+
+    outFiles = []
+    for extension in ["png", "pdf"]:
+        outFile = "%s.%s"%(outName, extension)
+        fig.savefig(outFile, metadata = SAVEFIG_METADATA[extension])
+        outFiles.append(outFile)
+
+    return outFiles
+
+##-- Render tower map tasks serially (jobs = 1) or with a pool of jobs processes. Outputs are identical in both modes
+def RenderTowerMaps(tasks, jobs):
+    if(jobs > 1):
+        print("Rendering %s plots with %s processes"%(len(tasks), jobs))
+        chunksize = max(1, len(tasks) // (4 * jobs))
+        with ProcessPoolExecutor(max_workers = jobs) as executor:
+            outFiles = list(executor.map(PlotTowerMap, tasks, chunksize = chunksize))
+    else:
+        outFiles = [PlotTowerMap(task) for task in tasks]
+
+    return outFiles
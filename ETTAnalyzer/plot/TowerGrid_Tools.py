@@ -0,0 +1,64 @@
+"""
+18 October 2026
+
+The purpose of this module is to build ECAL barrel trigger tower grids for many events at once, for the beam splash tower maps.
+
+Example usage:
+
+from TowerGrid_Tools import BuildTowerGrids, DisplayGrid
+grids = BuildTowerGrids(arrays, ["twrADC", "time"]) # arrays from Plotter_Tools.LoadBranches
+grid = DisplayGrid(grids["twrADC"][0], "twrADC") # (34, 72) grid of the first event
+"""
+
+import numpy as np
+import awkward as ak
+
+##-- EB tower grid: 34 ieta rows (ieta = -17..-1, 1..17 without the ieta = 0 column) and 72 iphi columns (iphi = 1..72)
+N_IETA = 34
+N_IPHI = 72
+IETA_EXTENT = (-17, 17)
+IPHI_EXTENT = (1, 73)
+
+##-- Variables drawn only where the tower sum is >= 1 (cmin = 1 of the former plt.hist2d maps)
+CMIN_VARIABLES = ["twrADC", "twrEmul3ADC", "FineGrainBit", "rawTPEmulFineGrainBit3"]
+
+##-- Row and column of each tower in the grid. Towers outside of EB are flagged by inEB = False
+def TowerGridIndices(ieta, iphi):
+    ieta = np.asarray(ieta, dtype = np.int64)
+    iphi = np.asarray(iphi, dtype = np.int64)
+    ieta_index = np.where(ieta < 0, ieta + 17, ieta + 16) # remove the middle column of ieta = 0
+    iphi_index = iphi - 1
+    inEB = (ieta != 0) & (ieta_index >= 0) & (ieta_index < N_IETA) & (iphi_index >= 0) & (iphi_index < N_IPHI)
+    return ieta_index, iphi_index, inEB
+
+##-- Tower mask used for the maps: remove TTs with ttFlag 4 and towers without a rec hit time
+def TowerMask(ttFlag, time):
+    return (np.asarray(ttFlag) != 4) & (np.asarray(time) != -999)
+
+##-- Scatter the towers of all events into one (events x 34 x 72) tensor per variable
+def BuildTowerGrids(arrays, variables, taggedOnly = False):
+    N_events = len(arrays["ieta"])
+    counts = np.asarray(ak.num(arrays["ieta"]))
+    eventIndex = np.repeat(np.arange(N_events), counts)
+
+    ieta_index, iphi_index, inEB = TowerGridIndices(ak.flatten(arrays["ieta"]), ak.flatten(arrays["iphi"]))
+    mask = inEB & TowerMask(ak.flatten(arrays["ttFlag"]), ak.flatten(arrays["time"]))
+    if(taggedOnly):
+        mask &= (np.asarray(ak.flatten(arrays["rawTPEmulFineGrainBit3"])) == 1) # tagged in emulator
+
+    gridIndex = (eventIndex[mask] * N_IETA + ieta_index[mask]) * N_IPHI + iphi_index[mask]
+    nBins = N_events * N_IETA * N_IPHI
+
+    grids = {}
+    for v_to_plot in variables:
+        weights = np.asarray(ak.flatten(arrays[v_to_plot]), dtype = np.float64)[mask]
+        grid = np.bincount(gridIndex, weights = weights, minlength = nBins)
+        grids[v_to_plot] = grid.reshape(N_events, N_IETA, N_IPHI)
+
+    return grids
+
+##-- Grid as drawn: empty or < 1 towers are left blank for the cmin variables, as plt.hist2d(cmin = 1) did
+def DisplayGrid(grid, v_to_plot):
+    if(v_to_plot in CMIN_VARIABLES):
+        grid = np.where(grid < 1, np.nan, grid)
+    return grid
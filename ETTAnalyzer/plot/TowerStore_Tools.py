@@ -0,0 +1,122 @@
+"""
+18 October 2026
+
+The purpose of this module is to export the per-event EB tower grids of an ETTAnalyzer output file to a local store of memory-mapped
+numpy arrays, so that repeated plotting does not go back to the ROOT file.
+
+One store directory per configuration holds:
+    <variable>.npy                   (events x 34 x 72) tower grids, int16 (ADC, fine grain bits) or float32 (time)
+    evtNb.npy, runNb.npy, lumiBlock.npy  event table
+    store.json                       source file, its signature and checksum, variables and dtypes
+
+Example usage:
+
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one --exportStore # export, then plot from the store
+python3 plot/PlotBeamSplashes.py --TPMode Tagging --Weights 0p5 --year 2022 --beam one # plot from the store if it is up to date
+
+In a notebook (see ETT_Plotter.ipynb):
+from TowerStore_Tools import OpenTowerStore, TowerStorePath, DEFAULT_STORE_DIRECTORY
+store = OpenTowerStore(TowerStorePath(DEFAULT_STORE_DIRECTORY, "0p5", "Tagging", "one"))
+plt.imshow(store["twrADC"][0], origin = "lower")
+"""
+
+import numpy as np
+import uproot
+import os
+
+from TowerGrid_Tools import BuildTowerGrids, N_IETA, N_IPHI
+from EventIndex_Tools import FileSignature
+from PlotCache_Tools import FileChecksum, ReadJson, WriteJson
+
+STORE_VARIABLES = ["twrADC", "twrEmul3ADC", "time", "FineGrainBit", "rawTPEmulFineGrainBit3"]
+STORE_DTYPES = {
+    "twrADC" : np.int16,
+    "twrEmul3ADC" : np.int16,
+    "time" : np.float32,
+    "FineGrainBit" : np.int16,
+    "rawTPEmulFineGrainBit3" : np.int16,
+}
+EVENT_TABLE = ["evtNb", "runNb", "lumiBlock"]
+META_NAME = "store.json"
+DEFAULT_STORE_DIRECTORY = os.path.expanduser("~/.cache/ETTAnalyzer/TowerStores/")
+
+##-- Store directory of one GetPathDict configuration
+def TowerStorePath(storeDirectory, Weights, TPMode, beamNumber):
+    return "%s/%s_%s_%s/"%(storeDirectory, Weights, TPMode, beamNumber)
+
+##-- Stream the tree in chunks and write each chunk's grids straight into the memory-mapped output arrays
+def ExportTowerStore(f_path, storePath, variables = STORE_VARIABLES, taggedOnly = 0, step_size = "100 MB", treeName = "tuplizer/ETTAnalyzerTree"):
+    print("Exporting tower grids of %s to %s"%(f_path, storePath))
+    os.makedirs(storePath, exist_ok = True)
+    metaPath = "%s/%s"%(storePath, META_NAME)
+    if(os.path.isfile(metaPath)): os.remove(metaPath) # the store is invalid until the export finishes
+    t = uproot.open(f_path)[treeName]
+    N_events = t.num_entries
+
+    outArrays = {}
+    for v in variables:
+        outArrays[v] = np.lib.format.open_memmap("%s/%s.npy"%(storePath, v), mode = "w+", dtype = STORE_DTYPES[v], shape = (N_events, N_IETA, N_IPHI))
+    for v in EVENT_TABLE:
+        outArrays[v] = np.lib.format.open_memmap("%s/%s.npy"%(storePath, v), mode = "w+", dtype = np.int64, shape = (N_events,))
+
+    branches = list(dict.fromkeys(EVENT_TABLE + ["ieta", "iphi", "time", "ttFlag", "rawTPEmulFineGrainBit3"] + list(variables)))
+    entry_start = 0
+    for chunk in t.iterate(branches, step_size = step_size):
+        entry_stop = entry_start + len(chunk)
+        grids = BuildTowerGrids(chunk, variables, taggedOnly = taggedOnly)
+        for v in variables:
+            outArrays[v][entry_start:entry_stop] = grids[v]
+        for v in EVENT_TABLE:
+            outArrays[v][entry_start:entry_stop] = np.asarray(chunk[v])
+        entry_start = entry_stop
+
+    for outArray in outArrays.values():
+        outArray.flush()
+
+    size, mtime = FileSignature(f_path)
+    meta = {
+        "source" : f_path,
+        "size" : size,
+        "mtime" : mtime,
+        "inputChecksum" : FileChecksum(f_path),
+        "taggedOnly" : taggedOnly,
+        "N_events" : N_events,
+        "variables" : {v : np.dtype(STORE_DTYPES[v]).name for v in variables},
+    }
+    WriteJson(metaPath, meta) # written last: a store without store.json is incomplete
+    return storePath
+
+##-- Memory-mapped view of a store. Arrays are only read from disk when indexed
+def OpenTowerStore(storePath):
+    meta = ReadJson("%s/%s"%(storePath, META_NAME))
+    if(len(meta) == 0):
+        raise FileNotFoundError("No tower store found in %s"%(storePath))
+    store = {"meta" : meta}
+    for v in list(meta["variables"].keys()) + EVENT_TABLE:
+        store[v] = np.load("%s/%s.npy"%(storePath, v), mmap_mode = "r")
+    return store
+
+##-- A store is up to date if it was exported after the last change of the source file, and the source still has the signature
+##-- recorded at export or, if not (e.g. copied with a new mtime), the same checksum. A source that cannot be reached (e.g. no EOS
+##-- access) is not checked
+def IsStoreCurrent(storePath, meta, f_path):
+    size, mtime = FileSignature(f_path)
+    if(size == -1):
+        return True
+    if(os.stat("%s/%s"%(storePath, META_NAME)).st_mtime_ns < mtime):
+        return False
+    return (size, mtime) == (meta["size"], meta["mtime"]) or FileChecksum(f_path) == meta["inputChecksum"]
+
+##-- Open a store only if it exists, was exported from f_path, is up to date with it and contains the needed variables
+def LoadTowerStore(storePath, f_path, variables, taggedOnly = 0):
+    meta = ReadJson("%s/%s"%(storePath, META_NAME))
+    if(len(meta) == 0):
+        return None
+    if(meta["source"] != f_path or meta["taggedOnly"] != taggedOnly or not IsStoreCurrent(storePath, meta, f_path)):
+        print("Tower store %s is out of date with %s, reading the ROOT file. Re-export it with --exportStore"%(storePath, f_path))
+        return None
+    missing = [v for v in variables if v not in meta["variables"]]
+    if(len(missing) > 0):
+        print("Tower store %s has no %s, reading the ROOT file"%(storePath, missing))
+        return None
+    return OpenTowerStore(storePath)
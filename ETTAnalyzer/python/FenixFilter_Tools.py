@@ -0,0 +1,101 @@
+"""
+18 October 2026
+
+The purpose of this module is to emulate the FENIX strip amplitude filters (EVEN and ODD weights) and the ODD > EVEN tagging
+decision offline, on TPInfoProcess dataframes (columns wd0-wd4, d0-d4, Filter), to test new ODD weights without cmsRun.
+
+The filter follows EcalFenixAmplitudeFilter: the encoded 7 bit weights are sign extended, each weight x digi product is shifted
+right by 6 bits (floor division by 64, as the arithmetic shift of the hardware) before the sum, and the sum is clipped to 0-0x3FFFF.
+
+Example usage:
+
+from ProcessTPinfo_Tools import TPInfoProcess
+from FenixFilter_Tools import ValidateFenixFilter, TagStrips
+TPinfo_DF = TPInfoProcess(inputFile, "", "", headerFile, outLoc).CreateDataframe()
+ValidateFenixFilter(TPinfo_DF, "amp") # compare to the amplitude printed by the emulator, if the dump has one
+tags = TagStrips(TPinfo_DF, oddWeights = [83, 0, 93, 63, 17]) # ODD > EVEN decision with candidate ODD weights
+"""
+
+import numpy as np
+import pandas as pd
+
+from ProcessTPinfo_Tools import GetDigis, DIGI_COLUMNS, WEIGHT_COLUMNS
+
+FENIX_SHIFT = 6
+FENIX_MAX_AMPLITUDE = 0x3FFFF
+
+##-- 7 bit encoded weights (0-127) -> signed weights (-64-63), as in EcalFenixAmplitudeFilter::setParameters
+def SignedWeights(encodedWeights):
+    encodedWeights = np.asarray(encodedWeights, dtype = np.int64)
+    return np.where(encodedWeights & 0x40, encodedWeights - 128, encodedWeights)
+
+##-- Filter output of each pulse with its own weights: digis (N, 5), encoded weights (N, 5) or (5,) -> (N,)
+def FenixFilter(digis, encodedWeights):
+    products = SignedWeights(encodedWeights) * np.asarray(digis, dtype = np.int64)
+    amplitudes = (products >> FENIX_SHIFT).sum(axis = -1) # the shift is applied to each term, before the sum
+    return np.clip(amplitudes, 0, FENIX_MAX_AMPLITUDE)
+
+##-- Number of weight x digi products per batch of FenixFilterCandidateBatches: 4M int64 products, 32 MB per temporary array
+FENIX_BATCH_ELEMENTS = 4000000
+
+##-- Filter output of batches of pulses for K candidate weight sets: digis (N, 5), encoded weights (K, 5) -> (start, (n, K)) per batch
+##-- The per-term truncation prevents a single matrix product, so the products are computed batch by batch, with a number of pulses
+##-- per batch set by K so that the (n, K, 5) products stay within max_elements whatever the number of candidates
+def FenixFilterCandidateBatches(digis, encodedWeights, max_elements = FENIX_BATCH_ELEMENTS):
+    digis = np.asarray(digis, dtype = np.int64)
+    signedWeights = SignedWeights(np.atleast_2d(encodedWeights))
+    batch_size = max(1, max_elements // (5 * len(signedWeights)))
+    for start in range(0, len(digis), batch_size):
+        products = digis[start:start + batch_size, None, :] * signedWeights[None, :, :]
+        products >>= FENIX_SHIFT
+        yield start, np.clip(products.sum(axis = 2), 0, FENIX_MAX_AMPLITUDE)
+
+##-- Filter output of N pulses for K candidate weight sets: digis (N, 5), encoded weights (K, 5) -> (N, K)
+def FenixFilterCandidates(digis, encodedWeights, max_elements = FENIX_BATCH_ELEMENTS):
+    amplitudes = np.empty((len(digis), len(np.atleast_2d(encodedWeights))), dtype = np.int64)
+    for start, batchAmplitudes in FenixFilterCandidateBatches(digis, encodedWeights, max_elements):
+        amplitudes[start:start + len(batchAmplitudes)] = batchAmplitudes
+    return amplitudes
+
+##-- Emulated filter output of each TPinfo row, with the weights of the row
+def EmulateTPinfo(TPinfo_DF):
+    return FenixFilter(GetDigis(TPinfo_DF), TPinfo_DF[WEIGHT_COLUMNS].to_numpy())
+
+##-- Compare the emulated amplitudes to a column recorded by the emulator. Returns the rows that differ
+def ValidateFenixFilter(TPinfo_DF, recordedColumn):
+    if(recordedColumn not in TPinfo_DF.columns):
+        raise KeyError("No column %s in the TPinfo dataframe to validate against. Columns: %s"%(recordedColumn, list(TPinfo_DF.columns)))
+    emulated = EmulateTPinfo(TPinfo_DF)
+    recorded = TPinfo_DF[recordedColumn].to_numpy()
+    mismatches = TPinfo_DF[emulated != recorded].assign(emulated = emulated[emulated != recorded])
+    print("FENIX filter emulation: %s / %s rows agree with %s"%(len(TPinfo_DF) - len(mismatches), len(TPinfo_DF), recordedColumn))
+    return mismatches
+
+##-- Pair the EVEN and ODD rows of each strip: the n-th EVEN row of a strip goes with its n-th ODD row (rows are printed in event order)
+def PairOddEven(TPinfo_DF, keys = ["stripid"]):
+    occurrence = TPinfo_DF.groupby(keys + ["Filter"], observed = True).cumcount().rename("occurrence")
+    rows = pd.concat([TPinfo_DF[keys], TPinfo_DF["Filter"], occurrence], axis = 1)
+    rows["row"] = np.arange(len(TPinfo_DF))
+    even = rows[rows["Filter"] == "EVEN"].drop(columns = "Filter")
+    odd = rows[rows["Filter"] == "ODD"].drop(columns = "Filter")
+    pairs = even.merge(odd, on = keys + ["occurrence"], suffixes = ("_even", "_odd"))
+    return pairs["row_even"].to_numpy(), pairs["row_odd"].to_numpy()
+
+##-- ODD > EVEN tagging of each strip. With oddWeights (5 encoded weights), the ODD filter is emulated with them on the digis of the
+##-- ODD rows instead of the weights used in the re-emulation. Returns one row per strip with both amplitudes and the decision
+def TagStrips(TPinfo_DF, oddWeights = None, keys = ["stripid"]):
+    evenRows, oddRows = PairOddEven(TPinfo_DF, keys)
+    digis = GetDigis(TPinfo_DF)
+    weights = TPinfo_DF[WEIGHT_COLUMNS].to_numpy()
+
+    evenAmplitudes = FenixFilter(digis[evenRows], weights[evenRows])
+    if(oddWeights is None):
+        oddAmplitudes = FenixFilter(digis[oddRows], weights[oddRows])
+    else:
+        oddAmplitudes = FenixFilter(digis[oddRows], np.asarray(oddWeights))
+
+    tags = TPinfo_DF.iloc[evenRows][keys + DIGI_COLUMNS].reset_index(drop = True)
+    tags["evenA"] = evenAmplitudes
+    tags["oddA"] = oddAmplitudes
+    tags["tagged"] = oddAmplitudes > evenAmplitudes
+    return tags
@@ -0,0 +1,52 @@
+"""
+18 October 2026
+
+The purpose of this module is to process emulator TPinfo printouts (cmsRun with TPinfoPrintout=True) with TPInfoProcess.
+
+Example usage:
+
+python3 python/ProcessTPinfo.py --inputFile TPinfo.log --headerFile TPinfoHeader.txt --outLoc plots/
+python3 python/ProcessTPinfo.py --inputFile TPinfo.log --headerFile TPinfoHeader.txt --outLoc plots/ --follow --idleTimeout 600 # while cmsRun is running
+python3 python/ProcessTPinfo.py --inputFiles "crab_*/TPinfo_*.log" --headerFile TPinfoHeader.txt --outLoc plots/ --nWorkers 16 # one summary for many job outputs
+python3 python/ProcessTPinfo.py --inputFile TPinfo.log --headerFile TPinfoHeader.txt --outLoc plots/ --EB_DOF_File DOF_EB_2018.csv --EE_DOF_File DOF_EE_2018.csv # with the strip geometry
+"""
+
+import time
+
+from ProcessTPinfo_Options import GetOptions
+from ProcessTPinfo_Tools import TPInfoProcess, TPinfoSummary, ReduceTPinfoFiles, CheckMakeOutLocation, SubdetCounts
+
+##-- Keep a running summary of the TPinfo file while cmsRun writes it, printed and plotted every updateInterval seconds
+def FollowTPinfo(TPinfo, args):
+    summary = TPinfoSummary()
+    lastUpdate = time.time()
+    for TPinfo_batch, summary in TPinfo.Follow(poll_interval = args.pollInterval, idle_timeout = args.idleTimeout, summary = summary):
+        if(time.time() - lastUpdate >= args.updateInterval):
+            summary.Print()
+            summary.Plot(args.outLoc)
+            lastUpdate = time.time()
+
+    print("No new TPinfo lines for %s seconds, stopping"%(args.idleTimeout))
+    summary.Print()
+    summary.Plot(args.outLoc)
+    return summary
+
+if(__name__ == '__main__'):
+    args = GetOptions()
+    CheckMakeOutLocation(args.outLoc)
+
+    if(args.inputFiles is not None):
+        summary = ReduceTPinfoFiles(args.inputFiles, args.headerFile, args.nWorkers, args.chunksize, args.EB_DOF_File, args.EE_DOF_File)
+        summary.Print()
+        summary.Plot(args.outLoc)
+    else:
+        TPinfo = TPInfoProcess(args.inputFile, args.EB_DOF_File, args.EE_DOF_File, args.headerFile, args.outLoc)
+        if(args.follow):
+            FollowTPinfo(TPinfo, args)
+        else:
+            TPinfo_DF = TPinfo.CreateDataframe()
+            if(TPinfo.hasDOFs):
+                TPinfo_DF = TPinfo.AddDOFs(TPinfo_DF)
+                print("Strips:", SubdetCounts(TPinfo_DF))
+            TPinfo.PlotRecoAs(TPinfo_DF)
+    print("DONE")
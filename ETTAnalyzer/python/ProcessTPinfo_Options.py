@@ -3,9 +3,26 @@ import argparse
 def GetOptions():
     parser = argparse.ArgumentParser()
 
+    ##-- Input
+    parser.add_argument('--inputFile', type=str, default="", help="Emulator TPinfo printout (MessageLogger TPinfo destination)", required=False)
+    parser.add_argument('--inputFiles', type=str, nargs="+", default=None, help="TPinfo printouts or glob patterns, e.g. one per CRAB job, summarized and merged together", required=False)
+    parser.add_argument('--headerFile', type=str, default="", help="File whose first line holds the TPinfo column names", required=False)
+    parser.add_argument('--EB_DOF_File', type=str, default="", help="EB DOF csv file, to add the strip geometry (with --EE_DOF_File) and count rows per subdetector", required=False)
+    parser.add_argument('--EE_DOF_File', type=str, default="", help="EE DOF csv file, to add the strip geometry (with --EB_DOF_File) and count rows per subdetector", required=False)
+
+    ##-- Follow mode
+    parser.add_argument('--follow', action="store_true", default=False, help="Follow the TPinfo file while cmsRun writes it, with a running summary", required=False)
+    parser.add_argument('--pollInterval', type=float, default=1., help="Follow mode: seconds between checks for new lines", required=False)
+    parser.add_argument('--idleTimeout', type=float, default=None, help="Follow mode: stop once the file did not grow for this many seconds (default: never)", required=False)
+    parser.add_argument('--updateInterval', type=float, default=60., help="Follow mode: seconds between summary printouts and plot updates", required=False)
+
+    ##-- Multiple files
+    parser.add_argument('--nWorkers', type=int, default=1, help="Number of processes used to summarize --inputFiles", required=False)
+    parser.add_argument('--chunksize', type=int, default=1000000, help="Number of TPinfo rows parsed at once per file", required=False)
+
     ##-- Misc
     parser.add_argument('--outLoc', type=str, default="", help="Output location for plots", required=False)
     # parser.add_argument('--boolFlag', action="store_true", default=False, help="", required=False)
 
     args = parser.parse_args()
-    return args
\ No newline at end of file
+    return args
@@ -7,10 +7,58 @@
 ########################################################################################################################
 
 import os 
+import io
+import itertools
+import time
+import glob
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd 
 from matplotlib import pyplot as plt 
+import matplotlib.colors as colors
 import numpy as np 
 
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError: ##-- optional: without pyarrow, TPinfo files are parsed with the C parser and not cached 
+    pa = None
+
+##-- Compact dtypes of the TPinfo columns. Columns not listed here keep the dtype inferred by pandas 
+##-- encoded weights (7 bit) fit in int16, digis need int32: the samples entering the FENIX filter are linearized, up to 18 bits 
+##-- (pandas wraps values that do not fit the dtype around without any error). Strip IDs are 32 bit raw DetIds 
+FILTER_DTYPE = pd.CategoricalDtype(["EVEN", "ODD"]) # fixed categories: chunks concatenate without falling back to object 
+TPINFO_DTYPES = {"Filter" : FILTER_DTYPE, "stripid" : np.uint32}
+for i in range(0, 5):
+    TPINFO_DTYPES["d%s"%(i)] = np.int32
+    TPINFO_DTYPES["wd%s"%(i)] = np.int16
+
+DIGI_COLUMNS = ["d%s"%(i) for i in range(0, 5)]
+IN_TIME_SAMPLE = 3 ##-- digi sample (0-4) at which in-time pulses peak: 125 ns 
+WEIGHT_COLUMNS = ["wd%s"%(i) for i in range(0, 5)]
+
+##-- Columnar cache of parsed TPinfo files: next to the input file, or in the local cache if that directory is not writable 
+COLUMNAR_SUFFIX = ".feather"
+COLUMNAR_CACHE_DIRECTORY = os.path.expanduser("~/.cache/ETTAnalyzer/TPinfo/")
+
+##-- Follow mode: size of the reads from the growing log, and amplitude binning of the running summary over the 18 bit range 
+##-- of the FENIX filter output (0-0x3FFFF) 
+FOLLOW_READ_SIZE = 16 * 1024 * 1024
+AMPLITUDE_BINS = np.linspace(0, 2**18, 129)
+
+##-- Pulse shape density: digis normalized to the pulse maximum, binned per sample 
+PULSE_DENSITY_BINS = np.linspace(0, 1, 101)
+PULSE_QUANTILES = [0.025, 0.16, 0.5, 0.84, 0.975]
+
+##-- Lines per chunk when a whole TPinfo file is parsed 
+PARSE_CHUNK_LINES = 4000000
+
+##-- The multithreaded pyarrow parser is the fastest: used to parse whole files, the C parser for chunks streamed to the caller 
+def GetCSVEngine(chunksize = None):
+    if(chunksize is None and pa is not None):
+        return "pyarrow"
+    return "c"
+
 class TPInfoProcess:
 
     def __init__(self, inputFile, EB_DOF_File, EE_DOF_File, headerFile, outLoc):
@@ -20,7 +68,11 @@ class TPInfoProcess:
         self.EE_DOF_File = EE_DOF_File
         self.headerFile = headerFile 
         self.outLoc = outLoc 
+        self.hasHeader = False ##-- True once AddHeader has written the header into the input file 
+        self.hasDOFs = EB_DOF_File != "" and EE_DOF_File != "" ##-- strip geometry added by AddDOFs when both DOF files are given 
+        self.stripLookup = None ##-- built from the DOF files by the first AddDOFs call 
 
+    ##-- Not needed anymore by CreateDataframe, which takes the column names from headerFile 
     def AddHeader(self):
         updatedFileName = "TPinfoWithHeader.txt"
         log_in = open(self.inputFile)
@@ -31,73 +83,144 @@ class TPInfoProcess:
             log_out.write(iline)        
         log_out.close()
         self.inputFile = self.updatedFileName 
+        self.hasHeader = True 
 
-    def CreateDataframe(self):
-        TPinfo_DF = pd.read_csv(self.inputFile, sep=" ")
-        return TPinfo_DF 
+    ##-- Column names: the header line of the input file once AddHeader has run, otherwise the header of headerFile 
+    def GetColumnNames(self):
+        with open(self.inputFile if self.hasHeader else self.headerFile) as header_:
+            return header_.readline().split()
+
+    ##-- Stream the TPinfo file in dataframes of up to chunksize records, without rewriting it with a header. The lines go through 
+    ##-- the record filter of ParseRecordLines, so a raw cmsRun log with %MSG lines can be read as is 
+    def IterateDataframe(self, chunksize = 1000000, columns = None, engine = "c"):
+        names = self.GetColumnNames()
+        if(columns is not None):
+            missing = [column for column in columns if column not in names]
+            if(len(missing) > 0):
+                raise KeyError("Columns %s not in %s"%(missing, self.headerFile))
+        with open(self.inputFile, errors = "replace") as f:
+            while True:
+                lines = list(itertools.islice(f, chunksize))
+                if(len(lines) == 0):
+                    break
+                yield ParseRecordLines(lines, names, columns, engine)
+
+    ##-- Size and modification time of the TPinfo file and its column names: the columnar cache is rebuilt if any of them change 
+    def GetSourceKey(self):
+        stat = os.stat(self.inputFile)
+        names = self.GetColumnNames()
+        return {"size" : str(stat.st_size), "mtime" : str(stat.st_mtime_ns), "columns" : " ".join(names)}
+
+    def GetColumnarPaths(self):
+        pathHash = hashlib.sha1(os.path.abspath(self.inputFile).encode()).hexdigest()
+        return ["%s%s"%(self.inputFile, COLUMNAR_SUFFIX), "%s/%s%s"%(COLUMNAR_CACHE_DIRECTORY, pathHash, COLUMNAR_SUFFIX)]
+
+    ##-- Parse the TPinfo file once and write it as an uncompressed Feather (Arrow IPC) file, which can be memory-mapped 
+    def ConvertToColumnar(self, chunksize = None):
+        if(pa is None):
+            raise ImportError("pyarrow is needed to write the columnar TPinfo cache")
+        TPinfo_DF = self.ParseDataframe(chunksize = chunksize)
+        table = pa.Table.from_pandas(TPinfo_DF, preserve_index = False)
+        metadata = dict(table.schema.metadata or {})
+        metadata.update({("source_%s"%(key)).encode() : value.encode() for key, value in self.GetSourceKey().items()})
+        table = table.replace_schema_metadata(metadata)
+        for columnarPath in self.GetColumnarPaths():
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(columnarPath)), exist_ok = True)
+                tmpPath = "%s.tmp%s"%(columnarPath, os.getpid())
+                feather.write_feather(table, tmpPath, compression = "uncompressed")
+                os.replace(tmpPath, columnarPath)
+                print("Wrote columnar TPinfo cache: %s"%(columnarPath))
+                return columnarPath
+            except OSError:
+                continue
+        print("Could not write columnar TPinfo cache for %s"%(self.inputFile))
+        return None
+
+    ##-- Path of an up to date columnar cache, None if there is none 
+    def FindColumnar(self):
+        if(pa is None):
+            return None
+        sourceKey = {("source_%s"%(key)).encode() : value.encode() for key, value in self.GetSourceKey().items()}
+        for columnarPath in self.GetColumnarPaths():
+            if(not os.path.isfile(columnarPath)):
+                continue
+            try:
+                with pa.memory_map(columnarPath) as source:
+                    metadata = pa.ipc.open_file(source).schema.metadata or {}
+            except (OSError, pa.ArrowInvalid):
+                continue
+            if(all(metadata.get(key) == value for key, value in sourceKey.items())):
+                return columnarPath
+        return None
+
+    ##-- Memory-map the columnar cache and load only the requested columns 
+    def LoadColumnar(self, columnarPath, columns = None):
+        table = feather.read_table(columnarPath, columns = None if columns is None else list(columns), memory_map = True)
+        return table.to_pandas(split_blocks = True)
+
+    ##-- Whole TPinfo file in one dataframe, from the columnar cache if it is up to date. Otherwise the text file is parsed 
+    ##-- and, with cache = True, converted to the columnar cache for the next calls 
+    def CreateDataframe(self, columns = None, chunksize = None, cache = True):
+        if(cache and pa is not None):
+            columnarPath = self.FindColumnar()
+            if(columnarPath is None):
+                columnarPath = self.ConvertToColumnar(chunksize = chunksize)
+            if(columnarPath is not None):
+                return self.LoadColumnar(columnarPath, columns)
+        return self.ParseDataframe(columns = columns, chunksize = chunksize)
+
+    ##-- Parse the TPinfo text file, in chunks of chunksize lines (PARSE_CHUNK_LINES by default). Without chunksize, the chunks 
+    ##-- are parsed with the pyarrow engine if it is available 
+    def ParseDataframe(self, columns = None, chunksize = None):
+        engine = GetCSVEngine(chunksize)
+        TPinfo_chunks = self.IterateDataframe(chunksize or PARSE_CHUNK_LINES, columns, engine)
+        return pd.concat(TPinfo_chunks, ignore_index = True)
 
+    ##-- Follow the TPinfo log while cmsRun writes it: yields (batch dataframe, running summary) for each batch of complete lines 
+    ##-- Stops once the file did not grow for idle_timeout seconds (never if None) 
+    def Follow(self, batch_size = 100000, poll_interval = 1., idle_timeout = None, summary = None):
+        names = self.GetColumnNames()
+        if(summary is None):
+            summary = TPinfoSummary()
+        for lines in FollowLines(self.inputFile, batch_size, poll_interval, idle_timeout):
+            TPinfo_batch = ParseRecordLines(lines, names)
+            if(len(TPinfo_batch) == 0):
+                continue
+            if(self.hasDOFs):
+                TPinfo_batch = self.AddDOFs(TPinfo_batch)
+            summary.Update(TPinfo_batch)
+            yield TPinfo_batch, summary 
+
+    ##-- FENIX filter amplitudes of each row with its own weights, as in the TPinfoSummary of ReduceTPinfoFiles. Returns the 
+    ##-- amplitude histograms per filter 
     def PlotRecoAs(self, TPinfo_DF):
-        recoA = ( TPinfo_DF["wd0"] * TPinfo_DF["d0"] ) + ( TPinfo_DF["wd1"] * TPinfo_DF["d1"] ) + ( TPinfo_DF["wd2"] * TPinfo_DF["d2"] ) + ( TPinfo_DF["wd3"] * TPinfo_DF["d3"] ) + ( TPinfo_DF["wd4"] * TPinfo_DF["d4"] )
+        digis = GetDigis(TPinfo_DF)
+        recoA = FilterAmplitudes(TPinfo_DF)
         TPinfo_DF["recoA"] = recoA
-        evenRecoAs = TPinfo_DF.loc[TPinfo_DF['Filter'] == "EVEN", "recoA"]
-        oddRecoAs = TPinfo_DF.loc[TPinfo_DF['Filter'] == "ODD", "recoA"]
-
-        TPinfo_DF = TPinfo_DF[(TPinfo_DF.d3 > TPinfo_DF.d0)] 
-        TPinfo_DF = TPinfo_DF[(TPinfo_DF.d3 > TPinfo_DF.d1)] 
-        TPinfo_DF = TPinfo_DF[(TPinfo_DF.d3 > TPinfo_DF.d2)] 
-        TPinfo_DF = TPinfo_DF[(TPinfo_DF.d3 > TPinfo_DF.d4)] 
-        evenDigis = TPinfo_DF.loc[TPinfo_DF['Filter'] == "EVEN" ] # find 125 ns peaked events 
-        # evenDigis = TPinfo_DF.loc[TPinfo_DF['Filter'] == "EVEN" and (TPinfo_DF['d3'] > TPinfo_DF['d2']) and (TPinfo_DF['d3'] > TPinfo_DF['d4'])] # find 125 ns peaked events 
-
-        digiAverages = []
-        for i in range(0,5):
-            exec("d%s = evenDigis['d%s'].to_numpy()"%(i,i))
-            exec("d%s_avg = d%s.mean()"%(i,i))
-            exec("digiAverages.append(d%s_avg)"%(i))
-        digis = np.stack((d0, d1, d2, d3, d4), axis=1)
-
-        # plt.scatter([50, 75, 100, 125, 150], digiAverages, label = "Digi averages")
-        plt.plot(digis.T, label = "Digis")
-        # plt.legend()
-        plt.savefig("%s/Digis.png"%(self.outLoc))
-        plt.close() 
-
-        plt.hist(oddRecoAs,
-                label = "ODD",
-                )
-        plt.legend()
-        plt.savefig("%s/OddFilterAmplitudes.png"%(self.outLoc))
+        Filters = TPinfo_DF["Filter"].to_numpy()
+        isEven = Filters == "EVEN"
 
-        plt.close()
+        evenDigis = digis[isEven & (PeakSample(digis) == IN_TIME_SAMPLE)] # find 125 ns peaked events 
 
-        plt.hist(evenRecoAs,
-                label = "EVEN" 
-                )
+        # One 2D histogram of all pulses instead of one line per pulse: time and memory do not depend on the number of pulses 
+        pulseDensity = PulseDensityHistogram(evenDigis)
+        PlotPulseDensity(pulseDensity, "%s/Digis.png"%(self.outLoc), label = "EVEN, 125 ns peak")
 
-        plt.legend()
-        plt.savefig("%s/EvenFilterAmplitudes.png"%(self.outLoc))        
-
-    ##-- This is too slow 
-    # def AddDOFs(self, TPinfo_DF):
-        # print"Adding DOFs to DF"
-        # EB_DF = pd.read_csv(self.EB_DOF_File, sep=",")
-        # EE_DF = pd.read_csv(self.EE_DOF_File, sep=",")
-
-        # DOF_one_column = ["DOF1"]
-        # DOF_two_column = ["DOF2"]
-        # DOF_three_column = ["DOF3"]
-
-        # for index, row in TPinfo_DF.iterrows():
-        #     # print"row:",row
-        #     # print"stripid:",row['stripid']
-        #     stripid = row['stripid']
-        #     DOF1, DOF2, DOF3 = FindStripDOFs(EB_DF,EE_DF,stripid)
-        #     print"DOF1, DOF2, DOF3:"
-        #     print DOF1 
-        #     print DOF2 
-        #     print DOF3 
-        #     if index == 3: break 
-        
+        amplitudeHists = {Filter : AmplitudeHistogram(recoA[Filters == Filter]) for Filter in FILTER_DTYPE.categories}
+        PlotAmplitudeHistograms(amplitudeHists, AMPLITUDE_BINS, self.outLoc)
+        return amplitudeHists 
+
+    ##-- Attach the strip geometry to each TPinfo row, in one sorted-array join over the whole dataframe 
+    ##-- DOF1, DOF2, DOF3 = (iphi, ieta, 0) for EB strips and (ix, iy, side) for EE strips, -999 and no subdet for unknown strips 
+    def AddDOFs(self, TPinfo_DF):
+        if(self.stripLookup is None):
+            print("Adding DOFs to DF")
+            self.stripLookup = BuildStripLookup(self.EB_DOF_File, self.EE_DOF_File)
+        DOFs = LookupStripDOFs(self.stripLookup, TPinfo_DF["stripid"].to_numpy())
+        for column, values in DOFs.items():
+            TPinfo_DF[column] = values
+        return TPinfo_DF 
 
 ##-- Non-Class Functions 
 def CheckMakeOutLocation(outLoc_):
@@ -107,21 +230,351 @@ def CheckMakeOutLocation(outLoc_):
         os.system('mkdir %s'%(outLoc_))
         os.system('cp %s/index.php %s'%(beforeOutLoc,outLoc_))  
 
-# def FindStripDOFs(EB_DF, EE_DF, stripid):
-#     # First check EB info 
-#     for EBindex, EBrow in EB_DF.iterrows():
-#         if EBrow['stripid'] == stripid:
-#             print"Found strip ID:",stripid
-#             DOF1 = EBrow['iphi']
-#             DOF2 = EBrow['ieta']
-#             DOF3 = 0 # iz = 0 for EB 
-#             break 
-#     for EEindex, EErow in EE_DF.iterrows():
-#         if EErow['stripid'] == stripid:
-#             print"Found strip ID:",stripid 
-#             DOF1 = EErow['ix']
-#             DOF2 = EErow['iy']
-#             DOF3 = EErow['side']               
-#             break 
-
-#     return DOF1, DOF2, DOF3 
+##-- (N, 5) block of digis d0-d4 
+def GetDigis(TPinfo_DF):
+    return TPinfo_DF[DIGI_COLUMNS].to_numpy(dtype = np.int64)
+
+##-- Amplitudes of N pulses for K weight sets at once: (N, 5) digis x (K, 5) weights -> (N, K), in one matrix product 
+##-- These are plain weighted sums, without the per-term >>6 and the clipping of the FENIX (see FenixFilterCandidates for the 
+##-- emulated filter output). Integer digis and weights are multiplied in int64, exact for 18 bit digis and 7 bit weights 
+def ComputeAmplitudes(digis, weightSets):
+    digis = np.asarray(digis)
+    weightSets = np.atleast_2d(np.asarray(weightSets))
+    if(weightSets.shape[1] != 5):
+        raise ValueError("Weight sets should have 5 weights, got shape %s"%(str(weightSets.shape)))
+    if(np.issubdtype(digis.dtype, np.integer) and np.issubdtype(weightSets.dtype, np.integer)):
+        return digis.astype(np.int64) @ weightSets.astype(np.int64).T
+    return digis.astype(np.float64) @ weightSets.astype(np.float64).T
+
+##-- FENIX filter output of each TPinfo row with the weights of the row: the amplitudes of PlotRecoAs and TPinfoSummary 
+def FilterAmplitudes(TPinfo_DF):
+    from FenixFilter_Tools import FenixFilter # imported here: FenixFilter_Tools imports this module 
+    return FenixFilter(GetDigis(TPinfo_DF), TPinfo_DF[WEIGHT_COLUMNS].to_numpy())
+
+##-- Amplitude counts per bin, overflows in the edge bins 
+def AmplitudeHistogram(amplitudes, bins = AMPLITUDE_BINS):
+    return np.histogram(np.clip(amplitudes, bins[0], bins[-1]), bins = bins)[0]
+
+def PlotAmplitudeHistograms(amplitudeHists, bins, outLoc):
+    for Filter, outName in [("ODD", "OddFilterAmplitudes"), ("EVEN", "EvenFilterAmplitudes")]:
+        plt.hist(bins[:-1], weights = amplitudeHists[Filter], bins = bins, label = Filter)
+        plt.legend()
+        plt.savefig("%s/%s.png"%(outLoc, outName))
+        plt.close()
+
+##-- Index (0-4) of the sample with the highest digi for each pulse, -1 if the maximum is not unique 
+def PeakSample(digis):
+    digis = np.asarray(digis)
+    peak = np.argmax(digis, axis = 1)
+    isMax = digis == digis[np.arange(len(digis)), peak][:, None]
+    peak[isMax.sum(axis = 1) > 1] = -1 # as the former d3 > d0, d1, d2, d4 selection, ties are not peaks 
+    return peak 
+
+##-- Generator of batches of complete lines appended to a file. The last, incomplete line is kept until its end is written 
+def FollowLines(f_path, batch_size = 100000, poll_interval = 1., idle_timeout = None):
+    idle = 0.
+    while(not os.path.exists(f_path)): # cmsRun may not have created the log yet 
+        if(idle_timeout is not None and idle >= idle_timeout):
+            return 
+        time.sleep(poll_interval)
+        idle += poll_interval
+
+    buffer = b""
+    f = open(f_path, "rb")
+    try:
+        while True:
+            data = f.read(FOLLOW_READ_SIZE)
+            if(data):
+                idle = 0.
+                chunk = buffer + data
+                end = chunk.rfind(b"\n") + 1
+                buffer = chunk[end:] # incomplete last line, or empty 
+                lines = chunk[:end].decode(errors = "replace").splitlines()
+                for i in range(0, len(lines), batch_size):
+                    yield lines[i:i + batch_size]
+                continue
+
+            if(os.path.getsize(f_path) < f.tell()): # truncated or rewritten: start again from the beginning 
+                print("%s was truncated, reading it again from the start"%(f_path))
+                f.seek(0)
+                buffer = b""
+                continue
+            if(idle_timeout is not None and idle >= idle_timeout):
+                break
+            time.sleep(poll_interval)
+            idle += poll_interval
+    finally:
+        f.close()
+
+    if(buffer.strip()): # the job finished without a final newline 
+        yield [buffer.decode(errors = "replace")]
+
+##-- TPinfo records among MessageLogger output lines: only lines with one field per column are parsed, which skips 
+##-- the %MSG lines, the header and any other printout. Lines with one more field start with a row index, which is dropped 
+##-- (as pd.read_csv did with the former header-less files). Only the requested columns are returned, in the requested order 
+def ParseRecordLines(lines, names, columns = None, engine = "c"):
+    records = []
+    for line in lines:
+        fields = line.split()
+        offset = len(fields) - len(names)
+        if((offset == 0 or offset == 1) and fields[offset] != names[0]):
+            records.append(" ".join(fields[offset:]))
+    columns = names if columns is None else list(columns)
+    dtypes = {column : dtype for column, dtype in TPINFO_DTYPES.items() if column in columns}
+    if(len(records) == 0):
+        return pd.DataFrame({column : pd.Series(dtype = dtypes.get(column, object)) for column in columns})
+    options = dict(sep = " ", header = None, names = names, dtype = dtypes)
+    if(engine != "pyarrow"): # pandas' pyarrow engine mixes up usecols with names: the columns are selected after parsing 
+        options["usecols"] = columns
+    TPinfo_DF = pd.read_csv(io.BytesIO("\n".join(records).encode()), engine = engine, **options)
+    return TPinfo_DF[columns] # usecols keeps the file order 
+
+##-- Running summary of TPinfo batches: number of rows, amplitude histograms and moments per filter, 
+##-- pulse counts and digi sums per peak sample, pulse shape density of the EVEN rows per peak sample. Amplitudes are the FENIX filter outputs 
+##-- of FilterAmplitudes, as in PlotRecoAs 
+##-- Summaries of different files can be merged, e.g. the partial results of ReduceTPinfoFiles 
+class TPinfoSummary:
+
+    def __init__(self, bins = AMPLITUDE_BINS, densityBins = PULSE_DENSITY_BINS):
+        self.bins = np.asarray(bins, dtype = np.float64)
+        self.densityBins = np.asarray(densityBins, dtype = np.float64)
+        self.N_files = 0
+        self.N_rows = 0
+        self.filters = list(FILTER_DTYPE.categories)
+        self.counts = {Filter : 0 for Filter in self.filters}
+        self.amplitudeHists = {Filter : np.zeros(len(self.bins) - 1, dtype = np.int64) for Filter in self.filters}
+        self.amplitudeSums = {Filter : 0. for Filter in self.filters}
+        self.amplitudeSquares = {Filter : 0. for Filter in self.filters}
+        self.peakCounts = np.zeros(6, dtype = np.int64) # peak sample -1 (no unique maximum), 0-4 
+        self.peakDigiSums = np.zeros((6, 5), dtype = np.int64)
+        self.pulseDensity = np.zeros((6, 5, len(self.densityBins) - 1), dtype = np.int64)
+        self.subdetCounts = {subdet : 0 for subdet in SUBDETS} # rows per subdetector, for dataframes with the DOFs of AddDOFs 
+
+    def Update(self, TPinfo_DF):
+        digis = GetDigis(TPinfo_DF)
+        recoA = FilterAmplitudes(TPinfo_DF)
+        Filters = TPinfo_DF["Filter"].to_numpy()
+        self.N_rows += len(TPinfo_DF)
+        for Filter in self.filters:
+            amplitudes = recoA[Filters == Filter]
+            self.counts[Filter] += len(amplitudes)
+            self.amplitudeHists[Filter] += AmplitudeHistogram(amplitudes, self.bins)
+            self.amplitudeSums[Filter] += float(amplitudes.sum())
+            self.amplitudeSquares[Filter] += float(np.square(amplitudes, dtype = np.float64).sum())
+
+        peak = PeakSample(digis) + 1 # row 0: no unique maximum 
+        self.peakCounts += np.bincount(peak, minlength = 6)
+        np.add.at(self.peakDigiSums, peak, digis)
+
+        isEven = Filters == "EVEN"
+        for peakIndex in np.unique(peak[isEven]):
+            self.pulseDensity[peakIndex] += PulseDensityHistogram(digis[isEven & (peak == peakIndex)], self.densityBins)
+
+        if("subdet" in TPinfo_DF.columns):
+            for subdet, count in SubdetCounts(TPinfo_DF).items():
+                self.subdetCounts[subdet] += count
+
+    ##-- Add the content of another summary, with the same binning 
+    def Merge(self, other):
+        if(not (np.array_equal(self.bins, other.bins) and np.array_equal(self.densityBins, other.densityBins))):
+            raise ValueError("Cannot merge TPinfo summaries with different binnings")
+        self.N_files += other.N_files
+        self.N_rows += other.N_rows
+        for Filter in self.filters:
+            self.counts[Filter] += other.counts[Filter]
+            self.amplitudeHists[Filter] += other.amplitudeHists[Filter]
+            self.amplitudeSums[Filter] += other.amplitudeSums[Filter]
+            self.amplitudeSquares[Filter] += other.amplitudeSquares[Filter]
+        self.peakCounts += other.peakCounts
+        self.peakDigiSums += other.peakDigiSums
+        self.pulseDensity += other.pulseDensity
+        for subdet in SUBDETS:
+            self.subdetCounts[subdet] += other.subdetCounts[subdet]
+        return self 
+
+    def MeanAmplitude(self, Filter):
+        return self.amplitudeSums[Filter] / self.counts[Filter] if self.counts[Filter] > 0 else np.nan
+
+    def RMSAmplitude(self, Filter):
+        if(self.counts[Filter] == 0):
+            return np.nan
+        mean = self.MeanAmplitude(Filter)
+        return np.sqrt(max(self.amplitudeSquares[Filter] / self.counts[Filter] - mean**2, 0.))
+
+    ##-- Mean pulse shape (5 samples) of the pulses peaking at peakSample (-1 to 4) 
+    def MeanPulse(self, peakSample):
+        N_pulses = self.peakCounts[peakSample + 1]
+        return self.peakDigiSums[peakSample + 1] / N_pulses if N_pulses > 0 else np.full(5, np.nan)
+
+    def Print(self):
+        print("%s TPinfo rows%s"%(self.N_rows, "" if self.N_files == 0 else " in %s files"%(self.N_files)))
+        for Filter in self.filters:
+            print("  %-4s: %10s rows, amplitude mean %.1f, rms %.1f"%(Filter, self.counts[Filter], self.MeanAmplitude(Filter), self.RMSAmplitude(Filter)))
+        print("  peak sample: %s"%(", ".join("%s: %s"%(peakSample, self.peakCounts[peakSample + 1]) for peakSample in range(-1, 5))))
+        if(sum(self.subdetCounts.values()) > 0):
+            print("  strips: %s"%(", ".join("%s: %s"%(subdet, count) for subdet, count in self.subdetCounts.items())))
+
+    def PlotAmplitudes(self, outLoc):
+        PlotAmplitudeHistograms(self.amplitudeHists, self.bins, outLoc)
+
+    ##-- Same plots as PlotRecoAs: pulse shapes of the EVEN rows peaking at IN_TIME_SAMPLE (125 ns) and ODD / EVEN amplitudes 
+    def Plot(self, outLoc):
+        PlotPulseDensity(self.pulseDensity[IN_TIME_SAMPLE + 1], "%s/Digis.png"%(outLoc), bins = self.densityBins, label = "EVEN, 125 ns peak")
+        self.PlotAmplitudes(outLoc)
+
+##-- Columns needed for a TPinfoSummary 
+SUMMARY_COLUMNS = ["Filter"] + WEIGHT_COLUMNS + DIGI_COLUMNS
+
+##-- Rows per subdetector of a dataframe with the DOFs of AddDOFs, strips missing from the DOF files as unknown 
+SUBDETS = ["EB", "EE", "unknown"]
+def SubdetCounts(TPinfo_DF):
+    counts = TPinfo_DF["subdet"].value_counts()
+    return {"EB" : int(counts.get("EB", 0)), "EE" : int(counts.get("EE", 0)), "unknown" : int(TPinfo_DF["subdet"].isna().sum())}
+
+##-- Map step: summary of one TPinfo file, from its columnar cache if it is up to date, otherwise streamed in chunks 
+##-- With both DOF files, the strip geometry is added to each chunk 
+def SummarizeTPinfoFile(inputFile, headerFile, chunksize = 1000000, EB_DOF_File = "", EE_DOF_File = ""):
+    TPinfo = TPInfoProcess(inputFile, EB_DOF_File, EE_DOF_File, headerFile, "")
+    columns = SUMMARY_COLUMNS + ["stripid"] if TPinfo.hasDOFs else SUMMARY_COLUMNS
+    summary = TPinfoSummary()
+    columnarPath = TPinfo.FindColumnar()
+    if(columnarPath is not None):
+        TPinfo_chunks = [TPinfo.LoadColumnar(columnarPath, columns)]
+    else:
+        TPinfo_chunks = TPinfo.IterateDataframe(chunksize, columns)
+    for TPinfo_chunk in TPinfo_chunks:
+        if(TPinfo.hasDOFs):
+            TPinfo_chunk = TPinfo.AddDOFs(TPinfo_chunk)
+        summary.Update(TPinfo_chunk)
+    summary.N_files = 1
+    return summary 
+
+##-- TPinfo files from a list of paths and glob patterns, e.g. ["crab_*/results/TPinfo_*.log"] 
+def ExpandInputFiles(inputFiles):
+    expanded = []
+    for inputFile in inputFiles:
+        matches = sorted(glob.glob(inputFile))
+        if(len(matches) == 0 and not glob.has_magic(inputFile)):
+            matches = [inputFile] # let the worker report the missing file 
+        expanded.extend(matches)
+    return list(dict.fromkeys(expanded))
+
+##-- Map-reduce over many TPinfo files: one summary per file in a pool of nWorkers processes, merged as they finish 
+def ReduceTPinfoFiles(inputFiles, headerFile, nWorkers = 1, chunksize = 1000000, EB_DOF_File = "", EE_DOF_File = ""):
+    inputFiles = ExpandInputFiles(inputFiles)
+    if(len(inputFiles) == 0):
+        raise FileNotFoundError("No TPinfo files found")
+    print("Summarizing %s TPinfo files with %s processes"%(len(inputFiles), nWorkers))
+
+    summary = TPinfoSummary()
+    if(nWorkers <= 1):
+        for inputFile in inputFiles:
+            summary.Merge(SummarizeTPinfoFile(inputFile, headerFile, chunksize, EB_DOF_File, EE_DOF_File))
+        return summary 
+
+    with ProcessPoolExecutor(max_workers = nWorkers) as executor:
+        futures = {executor.submit(SummarizeTPinfoFile, inputFile, headerFile, chunksize, EB_DOF_File, EE_DOF_File) : inputFile for inputFile in inputFiles}
+        for iFile, future in enumerate(as_completed(futures)):
+            summary.Merge(future.result())
+            print("Merged %s / %s: %s"%(iFile + 1, len(inputFiles), futures[future]))
+    return summary 
+
+##-- Pulses divided by their maximum sample. Pulses without a positive maximum are dropped 
+def NormalizePulses(digis):
+    digis = np.asarray(digis, dtype = np.float64)
+    peaks = digis.max(axis = 1) if len(digis) > 0 else np.zeros(0)
+    return digis[peaks > 0] / peaks[peaks > 0, None]
+
+##-- (5, N_bins) counts of normalized digis per sample. Values outside of the bins are put in the edge bins 
+def PulseDensityHistogram(digis, bins = PULSE_DENSITY_BINS):
+    normalized = NormalizePulses(digis)
+    N_bins = len(bins) - 1
+    binIndex = np.clip(np.searchsorted(bins, normalized, side = "right") - 1, 0, N_bins - 1)
+    sampleIndex = np.broadcast_to(np.arange(5), binIndex.shape)
+    return np.bincount((sampleIndex * N_bins + binIndex).ravel(), minlength = 5 * N_bins).reshape(5, N_bins)
+
+##-- Mean per sample from a pulse density histogram, with bin centres 
+def HistogramMean(hist, bins = PULSE_DENSITY_BINS):
+    centres = 0.5 * (bins[1:] + bins[:-1])
+    N_pulses = hist.sum(axis = 1)
+    return np.divide(hist @ centres, N_pulses, out = np.full(len(hist), np.nan), where = N_pulses > 0)
+
+##-- Quantiles per sample from a pulse density histogram, interpolated linearly in the cumulative distribution 
+def HistogramQuantiles(hist, quantiles = PULSE_QUANTILES, bins = PULSE_DENSITY_BINS):
+    values = np.full((len(quantiles), len(hist)), np.nan)
+    for sample, counts in enumerate(hist):
+        if(counts.sum() == 0):
+            continue
+        cdf = np.concatenate(([0.], np.cumsum(counts) / counts.sum()))
+        values[:, sample] = np.interp(quantiles, cdf, bins)
+    return values 
+
+##-- Pulse shape density plot: 2D histogram (sample, normalized ADC) with the mean and the 68% and 95% quantile bands 
+def PlotPulseDensity(hist, outName, bins = PULSE_DENSITY_BINS, label = None):
+    fig, ax = plt.subplots()
+    samples = np.arange(5)
+    sampleEdges = np.arange(6) - 0.5
+    mesh = ax.pcolormesh(sampleEdges, bins, hist.T, norm = colors.LogNorm(vmin = 1, vmax = max(hist.max(), 1)), cmap = "viridis")
+    fig.colorbar(mesh, ax = ax).set_label("Pulses")
+
+    q = HistogramQuantiles(hist, PULSE_QUANTILES, bins)
+    ax.fill_between(samples, q[0], q[4], color = "tab:orange", alpha = 0.25, label = "95%")
+    ax.fill_between(samples, q[1], q[3], color = "tab:orange", alpha = 0.5, label = "68%")
+    ax.plot(samples, q[2], color = "k", linestyle = "--", label = "Median")
+    ax.plot(samples, HistogramMean(hist, bins), color = "r", marker = "o", label = "Mean")
+
+    ax.set_xlabel("Sample")
+    ax.set_ylabel("ADC / pulse maximum")
+    ax.set_xticks(samples)
+    title = "%s pulses"%(int(hist[0].sum()))
+    if(label is not None):
+        title = "%s, %s"%(label, title)
+    ax.set_title(title)
+    ax.legend(loc = "lower right")
+    fig.savefig(outName)
+    plt.close(fig)
+
+##-- Strip ID -> geometry lookup from the EB and EE DOF files, which have one row per crystal: the first row of each strip is kept 
+##-- Returned as arrays sorted by stripid, for LookupStripDOFs 
+def BuildStripLookup(EB_DOF_File, EE_DOF_File):
+    EB_DF = pd.read_csv(EB_DOF_File, sep = ",", usecols = ["stripid", "iphi", "ieta"])
+    EE_DF = pd.read_csv(EE_DOF_File, sep = ",", usecols = ["stripid", "ix", "iy", "side"])
+
+    stripids = np.concatenate((EB_DF["stripid"].to_numpy(), EE_DF["stripid"].to_numpy())).astype(np.int64)
+    DOF1 = np.concatenate((EB_DF["iphi"].to_numpy(), EE_DF["ix"].to_numpy()))
+    DOF2 = np.concatenate((EB_DF["ieta"].to_numpy(), EE_DF["iy"].to_numpy()))
+    DOF3 = np.concatenate((np.zeros(len(EB_DF), dtype = np.int64), EE_DF["side"].to_numpy())) # iz = 0 for EB 
+    subdet = np.concatenate((np.zeros(len(EB_DF), dtype = np.int8), np.ones(len(EE_DF), dtype = np.int8))) # 0: EB, 1: EE 
+
+    stripids, first = np.unique(stripids, return_index = True) # sorted, first occurrence of each strip 
+    stripLookup = {
+        "stripid" : stripids,
+        "DOF1" : DOF1[first].astype(np.int16),
+        "DOF2" : DOF2[first].astype(np.int16),
+        "DOF3" : DOF3[first].astype(np.int16),
+        "subdet" : subdet[first],
+    }
+    return stripLookup 
+
+##-- DOF columns of an array of strip IDs, with a binary search in the sorted lookup 
+def LookupStripDOFs(stripLookup, stripids):
+    stripids = np.asarray(stripids, dtype = np.int64)
+    lookupIDs = stripLookup["stripid"]
+    positions = np.minimum(np.searchsorted(lookupIDs, stripids), max(len(lookupIDs) - 1, 0))
+    found = np.zeros(len(stripids), dtype = bool)
+    if(len(lookupIDs) > 0):
+        found = lookupIDs[positions] == stripids
+        positions = np.where(found, positions, 0)
+
+    DOFs = {}
+    for column in ["DOF1", "DOF2", "DOF3"]:
+        DOFs[column] = np.full(len(stripids), -999, dtype = np.int16)
+        DOFs[column][found] = stripLookup[column][positions[found]]
+    codes = np.full(len(stripids), -1, dtype = np.int8)
+    codes[found] = stripLookup["subdet"][positions[found]]
+    DOFs["subdet"] = pd.Categorical.from_codes(codes, categories = ["EB", "EE"]) # -1: unknown strip 
+
+    N_missing = int((~found).sum())
+    if(N_missing > 0):
+        print("%s rows with strip IDs not found in the DOF files"%(N_missing))
+    return DOFs 
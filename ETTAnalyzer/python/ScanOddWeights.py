@@ -0,0 +1,174 @@
+"""
+18 October 2026
+
+The purpose of this module is to scan candidate encoded ODD weight sets and delta min thresholds on the digis of a TPinfo dump, with the
+offline FENIX emulator of FenixFilter_Tools. A pulse is tagged if ODD - EVEN > delta min (delta min = 0 is the FENIX ODD > EVEN decision).
+For each working point (ODD weights, delta min), the tagged fraction of in-time pulses (peak at --inTimeSample) and of out-of-time pulses
+(peak at any other sample) is reported.
+
+Candidates are split in shards, evaluated in a pool of processes, and each finished shard is saved in <outDir>/shards/, so that an
+interrupted scan only evaluates the missing shards when it is run again. The best working points can be written as weights/input files.
+
+Example usage:
+
+python3 python/ScanOddWeights.py --inputFile TPinfo.log --headerFile TPinfoHeader.txt --candidates candidates.txt --deltaMins 0,0.5,2.5 --outDir OddWeightsScan --nWorkers 16
+python3 python/ScanOddWeights.py --inputFile TPinfo.log --headerFile TPinfoHeader.txt --candidates candidates.txt --deltaMins 0 --outDir OddWeightsScan --writeWinners 3 # write the 3 best sets to weights/input
+
+candidates.txt has one set of 5 encoded weights per line, as the files in weights/input.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ProcessTPinfo_Tools import TPInfoProcess, GetDigis, PeakSample, WEIGHT_COLUMNS, DIGI_COLUMNS, IN_TIME_SAMPLE
+from FenixFilter_Tools import FenixFilter, FenixFilterCandidateBatches
+
+WEIGHTS_INPUT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "weights", "input")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--inputFile", type = str, required = True, help = "TPinfo printout with the digis to evaluate the weights on")
+parser.add_argument("--headerFile", type = str, required = True, help = "File whose first line holds the TPinfo column names")
+parser.add_argument("--candidates", type = str, nargs = "+", required = True, help = "Text files with one set of 5 encoded ODD weights per line")
+parser.add_argument("--deltaMins", type = str, default = "0", help = "Comma separated delta min thresholds on ODD - EVEN, in filter output units")
+parser.add_argument("--inTimeSample", type = int, default = IN_TIME_SAMPLE, help = "Sample (0-4) at which in-time pulses peak (default: sample %s, 125 ns, as the TPinfo plots of ProcessTPinfo_Tools)"%(IN_TIME_SAMPLE))
+parser.add_argument("--outDir", type = str, default = "OddWeightsScan", help = "Output directory of the scan results and shard checkpoints")
+parser.add_argument("--shardSize", type = int, default = 100, help = "Number of candidate weight sets per shard")
+parser.add_argument("--nWorkers", type = int, default = 1, help = "Number of processes evaluating shards")
+parser.add_argument("--maxInTimeFraction", type = float, default = 0.01, help = "Largest tagged fraction of in-time pulses allowed for a winner")
+parser.add_argument("--writeWinners", type = int, default = 0, help = "Write the N best working points to weights/input")
+parser.add_argument("--weightsDirectory", type = str, default = WEIGHTS_INPUT_DIRECTORY, help = "Output directory of the --writeWinners weights files")
+parser.add_argument("--nGroups", type = int, default = 2, help = "Number of weight groups (rows) in the written weights files, e.g. 2 for one EB and one EE group")
+
+##-- Digis of the scan, loaded once per worker process
+SCAN_DATA = {}
+
+##-- One row per pulse: the EVEN rows, with the EVEN weights used in the re-emulation. The ODD weights are the candidates
+def LoadScanData(inputFile, headerFile, inTimeSample):
+    TPinfo = TPInfoProcess(inputFile, "", "", headerFile, "")
+    TPinfo_DF = TPinfo.CreateDataframe(columns = ["Filter"] + WEIGHT_COLUMNS + DIGI_COLUMNS)
+    TPinfo_DF = TPinfo_DF[TPinfo_DF["Filter"] == "EVEN"]
+    digis = GetDigis(TPinfo_DF)
+    peak = PeakSample(digis)
+    SCAN_DATA["digis"] = digis
+    SCAN_DATA["evenA"] = FenixFilter(digis, TPinfo_DF[WEIGHT_COLUMNS].to_numpy())
+    SCAN_DATA["inTime"] = peak == inTimeSample
+    SCAN_DATA["outOfTime"] = (peak != inTimeSample) & (peak != -1) # pulses without a unique maximum are in neither category
+    return SCAN_DATA
+
+##-- Encoded weight sets from one or several text files, duplicates removed
+def ReadCandidates(candidateFiles):
+    candidates = np.concatenate([np.loadtxt(candidateFile, dtype = np.int64, ndmin = 2) for candidateFile in candidateFiles])
+    if(candidates.shape[1] != 5 or candidates.min() < 0 or candidates.max() > 127):
+        raise ValueError("Candidates should be sets of 5 encoded weights between 0 and 127")
+    _, first = np.unique(candidates, axis = 0, return_index = True)
+    return candidates[np.sort(first)]
+
+##-- Key of a shard: changes with the input file, the in-time definition, the thresholds or the candidates of the shard
+def ShardKey(inputKey, candidates, deltaMins, inTimeSample):
+    content = json.dumps({"input" : inputKey, "candidates" : candidates.tolist(), "deltaMins" : list(deltaMins), "inTimeSample" : inTimeSample})
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+##-- Tagged fractions of all working points of a shard: (K candidates x deltaMins) rows
+def EvaluateShard(candidates, deltaMins):
+    digis, evenA, inTime, outOfTime = SCAN_DATA["digis"], SCAN_DATA["evenA"], SCAN_DATA["inTime"], SCAN_DATA["outOfTime"]
+    N_inTime, N_outOfTime = int(inTime.sum()), int(outOfTime.sum())
+
+    ##-- Tagged pulse counts per delta min and candidate, summed over batches of pulses: the (pulses, candidates) deltas are never stored
+    N_tagged = np.zeros((len(deltaMins), len(candidates)), dtype = np.int64)
+    N_tagged_inTime = np.zeros_like(N_tagged)
+    N_tagged_outOfTime = np.zeros_like(N_tagged)
+    for start, oddA in FenixFilterCandidateBatches(digis, candidates):
+        stop = start + len(oddA)
+        delta = oddA - evenA[start:stop, None] # (batch pulses, candidates)
+        for i, deltaMin in enumerate(deltaMins):
+            tagged = delta > deltaMin
+            N_tagged[i] += tagged.sum(axis = 0)
+            N_tagged_inTime[i] += tagged[inTime[start:stop]].sum(axis = 0)
+            N_tagged_outOfTime[i] += tagged[outOfTime[start:stop]].sum(axis = 0)
+
+    rows = []
+    for i, deltaMin in enumerate(deltaMins):
+        for k, weights in enumerate(candidates):
+            rows.append({
+                "weights" : " ".join(str(w) for w in weights), "deltaMin" : deltaMin,
+                "N_inTime" : N_inTime, "N_outOfTime" : N_outOfTime,
+                "taggedInTime" : N_tagged_inTime[i, k] / N_inTime if N_inTime > 0 else np.nan,
+                "taggedOutOfTime" : N_tagged_outOfTime[i, k] / N_outOfTime if N_outOfTime > 0 else np.nan,
+                "tagged" : N_tagged[i, k] / len(digis) if len(digis) > 0 else np.nan,
+            })
+    return pd.DataFrame(rows)
+
+##-- Evaluate one shard and save it. Written to a temporary file first, so that an interrupted shard is evaluated again
+def RunShard(task):
+    shardPath, candidates, deltaMins = task
+    results = EvaluateShard(candidates, deltaMins)
+    tmpPath = "%s.tmp%s"%(shardPath, os.getpid())
+    results.to_csv(tmpPath, index = False)
+    os.replace(tmpPath, shardPath)
+    return shardPath
+
+def InitWorker(inputFile, headerFile, inTimeSample):
+    LoadScanData(inputFile, headerFile, inTimeSample)
+
+##-- Best working points: largest out-of-time tagged fraction with an in-time tagged fraction of at most maxInTimeFraction
+def SelectWinners(results, maxInTimeFraction, N_winners):
+    allowed = results[results["taggedInTime"] <= maxInTimeFraction]
+    return allowed.sort_values(["taggedOutOfTime", "taggedInTime"], ascending = [False, True]).head(N_winners)
+
+##-- weights/input file of a working point, one row per weight group, as MinDelta_2p5Prime_OddWeights.txt
+def WriteWeightsFile(weights, deltaMin, rank, nGroups, outDirectory = WEIGHTS_INPUT_DIRECTORY):
+    outName = "%s/Scan%s_DeltaMin%s_OddWeights.txt"%(outDirectory, rank, str(deltaMin).replace(".", "p"))
+    with open(outName, "w") as f:
+        for group in range(nGroups):
+            f.write("%s\n"%(weights))
+    print("Wrote weights file: %s"%(outName))
+    return outName
+
+def main():
+    args = parser.parse_args()
+    deltaMins = [float(deltaMin) for deltaMin in args.deltaMins.split(",")]
+    candidates = ReadCandidates(args.candidates)
+    shardDirectory = "%s/shards"%(args.outDir)
+    os.makedirs(shardDirectory, exist_ok = True)
+
+    stat = os.stat(args.inputFile)
+    inputKey = "%s:%s:%s"%(os.path.abspath(args.inputFile), stat.st_size, stat.st_mtime_ns)
+    tasks = []
+    for start in range(0, len(candidates), args.shardSize):
+        shardCandidates = candidates[start:start + args.shardSize]
+        shardPath = "%s/shard_%s.csv"%(shardDirectory, ShardKey(inputKey, shardCandidates, deltaMins, args.inTimeSample))
+        tasks.append((shardPath, shardCandidates, deltaMins))
+    todo = [task for task in tasks if not os.path.isfile(task[0])]
+    print("%s candidates x %s delta min: %s shards, %s already done"%(len(candidates), len(deltaMins), len(tasks), len(tasks) - len(todo)))
+
+    if(len(todo) > 0 and args.nWorkers > 1):
+        TPInfoProcess(args.inputFile, "", "", args.headerFile, "").CreateDataframe(columns = ["Filter"]) # parse once here: the workers then memory-map the columnar cache 
+        with ProcessPoolExecutor(max_workers = args.nWorkers, initializer = InitWorker, initargs = (args.inputFile, args.headerFile, args.inTimeSample)) as executor:
+            futures = [executor.submit(RunShard, task) for task in todo]
+            for ishard, future in enumerate(as_completed(futures)):
+                print("Shard %s / %s done: %s"%(ishard + 1, len(todo), future.result()))
+    elif(len(todo) > 0):
+        LoadScanData(args.inputFile, args.headerFile, args.inTimeSample)
+        for ishard, task in enumerate(todo):
+            print("Shard %s / %s done: %s"%(ishard + 1, len(todo), RunShard(task)))
+
+    results = pd.concat([pd.read_csv(task[0]) for task in tasks], ignore_index = True)
+    resultsPath = "%s/ScanResults.csv"%(args.outDir)
+    results.sort_values(["deltaMin", "taggedOutOfTime"], ascending = [True, False]).to_csv(resultsPath, index = False)
+    print("Wrote scan results: %s"%(resultsPath))
+
+    winners = SelectWinners(results, args.maxInTimeFraction, max(args.writeWinners, 10))
+    print("Best working points with at most %s of in-time pulses tagged:"%(args.maxInTimeFraction))
+    print(winners.to_string(index = False))
+    for rank, (_, winner) in enumerate(winners.head(args.writeWinners).iterrows()):
+        WriteWeightsFile(winner["weights"], winner["deltaMin"], rank, args.nGroups, args.weightsDirectory)
+    print("DONE")
+
+if(__name__ == '__main__'):
+    main()
@@ -0,0 +1,58 @@
+"""
+18 October 2026
+
+Tests of the amplitude computations of ProcessTPinfo_Tools.
+
+Example usage:
+cd ETTAnalyzer/python
+python3 -m pytest -q test_ProcessTPinfo_Tools.py
+"""
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+
+from ProcessTPinfo_Tools import TPInfoProcess, ReduceTPinfoFiles, ComputeAmplitudes, AMPLITUDE_BINS
+
+def RandomPulses(N = 1000, K = 7, seed = 0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2**18, (N, 5)), rng.integers(-64, 64, (K, 5))
+
+def test_ComputeAmplitudes_matches_rowwise():
+    digis, weightSets = RandomPulses()
+    amplitudes = ComputeAmplitudes(digis, weightSets)
+    assert amplitudes.shape == (len(digis), len(weightSets))
+    assert amplitudes.dtype == np.int64
+    for k, weights in enumerate(weightSets):
+        rowwise = np.array([sum(int(w) * int(d) for w, d in zip(weights, pulse)) for pulse in digis])
+        np.testing.assert_array_equal(amplitudes[:, k], rowwise)
+
+def test_ComputeAmplitudes_decimal_weights():
+    digis, weightSets = RandomPulses(K = 3)
+    decimalWeights = weightSets / 64.
+    np.testing.assert_allclose(ComputeAmplitudes(digis, decimalWeights), ComputeAmplitudes(digis, weightSets) / 64.)
+    np.testing.assert_array_equal(ComputeAmplitudes(digis, weightSets[0]), ComputeAmplitudes(digis, weightSets)[:, :1])
+
+##-- TPinfo log with MessageLogger lines, encoded weights (negative weights above 63) and 18 bit digis 
+def WriteTPinfoFiles(directory, N = 500, seed = 1):
+    rng = np.random.default_rng(seed)
+    headerFile, inputFile = directory / "header.txt", directory / "TPinfo.log"
+    headerFile.write_text("stripid Filter wd0 wd1 wd2 wd3 wd4 d0 d1 d2 d3 d4\n")
+    lines = ["%MSG-i EcalTPG: TPinfo"]
+    for i in range(N):
+        Filter = "EVEN" if i % 2 == 0 else "ODD"
+        weights = rng.integers(0, 128, 5)
+        digis = rng.integers(0, 2**18, 5)
+        lines.append(" ".join(str(v) for v in [838860000 + i // 2, Filter] + weights.tolist() + digis.tolist()))
+    inputFile.write_text("\n".join(lines) + "\n")
+    return str(inputFile), str(headerFile)
+
+def test_PlotRecoAs_matches_ReduceTPinfoFiles(tmp_path):
+    inputFile, headerFile = WriteTPinfoFiles(tmp_path)
+    TPinfo = TPInfoProcess(inputFile, "", "", headerFile, str(tmp_path))
+    amplitudeHists = TPinfo.PlotRecoAs(TPinfo.CreateDataframe(cache = False))
+    summary = ReduceTPinfoFiles([inputFile], headerFile)
+    assert np.array_equal(summary.bins, AMPLITUDE_BINS)
+    for Filter in ["EVEN", "ODD"]:
+        assert amplitudeHists[Filter].sum() == 250
+        np.testing.assert_array_equal(amplitudeHists[Filter], summary.amplitudeHists[Filter])
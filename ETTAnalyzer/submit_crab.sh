@@ -1,9 +1,4 @@
 #!/bin/bash
 
-for i in {-6..6}
-do
-   {
-   export DELAY=$i
-   crab submit CrabConfig_12_3_0.py
-   } &
-done
\ No newline at end of file
+# Submit one CRAB task per delay, -6 to 6 ns, in parallel with retries. See SubmitDelayScan.py for the options
+python3 SubmitDelayScan.py --delays=-6:6 "$@"
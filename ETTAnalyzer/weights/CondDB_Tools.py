@@ -0,0 +1,321 @@
+"""
+18 October 2026
+
+The purpose of this module is to handle conditions SQLite files (CondDB format, as written by the update*.py cmsRun configurations)
+with sqlite3, without CMSSW: read the manifest of the files to produce, check if a file is up to date with its input text file,
+split a staging file holding several tags into one file per tag, list the TAG / IOV / PAYLOAD entries of a file, decode the
+EcalTPGOddWeightGroup, EcalTPGOddWeightIdMap and EcalTPGTPMode payloads, compare two files, and keep one copy of each conditions
+file shipped to CRAB in a store keyed by the payload hashes.
+
+Example usage:
+
+from CondDB_Tools import ReadManifest, InputHash, IsUpToDate, ReadIOVs, DecodePayload, DiffConditions
+for entry in ReadManifest("conditions_manifest.txt"):
+    print(entry["output"], IsUpToDate(entry["output"], entry["tag"], InputHash(entry)))
+for iov in ReadIOVs("output/OneEBOneEEset.db"):
+    print(iov["TAG_NAME"], iov["SINCE"], DecodePayload(iov["OBJECT_TYPE"], iov["DATA"]))
+print(DiffConditions("output/OneEBOneEEset.db", "output/OneEBOneEEset_adding2021Strips.db"))
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+
+##-- PopCon analyzer writing each record from a text file
+RECORD_ANALYZERS = {
+    "EcalTPGOddWeightGroupRcd" : "ExTestEcalTPGOddWeightGroupAnalyzer",
+    "EcalTPGOddWeightIdMapRcd" : "ExTestEcalTPGOddWeightIdMapAnalyzer",
+    "EcalTPGTPModeRcd" : "ExTestEcalTPGTPModeAnalyzer",
+}
+
+HASH_PREFIX = "inputHash="
+
+##-- Tables with a row per tag, and their tag name column
+TAG_COLUMNS = [("IOV", "TAG_NAME"), ("TAG_LOG", "TAG_NAME"), ("TAG_AUTHORIZATION", "TAG_NAME"), ("TAG", "NAME")]
+
+##-- Manifest: one "input record tag output" line per conditions file, paths relative to the manifest. Lines starting with # are ignored
+def ReadManifest(manifestFile):
+    manifestDirectory = os.path.dirname(os.path.abspath(manifestFile))
+    entries = []
+    for iline, line in enumerate(open(manifestFile)):
+        line = line.split("#")[0].strip()
+        if(line == ""):
+            continue
+        fields = line.split()
+        if(len(fields) != 4):
+            raise ValueError("%s line %s: expected 'input record tag output', got '%s'"%(manifestFile, iline + 1, line))
+        inputFile, record, tag, output = fields
+        if(record not in RECORD_ANALYZERS):
+            raise ValueError("%s line %s: unknown record %s, known records: %s"%(manifestFile, iline + 1, record, list(RECORD_ANALYZERS.keys())))
+        entries.append({
+            "input" : os.path.normpath(os.path.join(manifestDirectory, inputFile)),
+            "record" : record,
+            "tag" : tag,
+            "output" : os.path.normpath(os.path.join(manifestDirectory, output)),
+        })
+
+    outputs = [entry["output"] for entry in entries]
+    duplicates = sorted(set(output for output in outputs if outputs.count(output) > 1))
+    if(len(duplicates) > 0):
+        raise ValueError("%s: several entries write %s"%(manifestFile, duplicates))
+    return entries
+
+##-- Hash of what a conditions file is made from: the input text file, the record and the tag
+def InputHash(entry):
+    sha1 = hashlib.sha1()
+    with open(entry["input"], "rb") as f:
+        sha1.update(f.read())
+    sha1.update(("%s %s"%(entry["record"], entry["tag"])).encode())
+    return sha1.hexdigest()
+
+##-- Input hash stored in the tag description of a conditions file, None if there is none
+def StoredInputHash(dbFile, tag):
+    if(not os.path.isfile(dbFile)):
+        return None
+    connection = sqlite3.connect(dbFile)
+    try:
+        rows = connection.execute("SELECT NAME, DESCRIPTION FROM TAG").fetchall()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        connection.close()
+    if(len(rows) != 1 or rows[0][0] != tag or not rows[0][1].startswith(HASH_PREFIX)):
+        return None
+    return rows[0][1][len(HASH_PREFIX):]
+
+def IsUpToDate(dbFile, tag, inputHash):
+    return StoredInputHash(dbFile, tag) == inputHash
+
+##-- Copy one tag of a staging file to its own file: other tags and their payloads are removed, the tag is renamed to
+##-- outputTag and its description records the input hash. The file is written next to the output first, then moved in place
+def ExtractTag(stagingFile, stagingTag, outputFile, outputTag, inputHash):
+    outputDirectory = os.path.dirname(os.path.abspath(outputFile))
+    os.makedirs(outputDirectory, exist_ok = True)
+    tmpFile = "%s.tmp%s"%(outputFile, os.getpid())
+    shutil.copyfile(stagingFile, tmpFile)
+
+    connection = sqlite3.connect(tmpFile)
+    try:
+        if(connection.execute("SELECT COUNT(*) FROM TAG WHERE NAME = ?", (stagingTag,)).fetchone()[0] != 1):
+            raise KeyError("Tag %s not found in %s"%(stagingTag, stagingFile))
+        tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table, column in TAG_COLUMNS:
+            if(table not in tables): # TAG_AUTHORIZATION only exists in files written by recent CMSSW versions
+                continue
+            connection.execute("DELETE FROM %s WHERE %s != ?"%(table, column), (stagingTag,))
+            connection.execute("UPDATE %s SET %s = ? WHERE %s = ?"%(table, column, column), (outputTag, stagingTag))
+        connection.execute("DELETE FROM PAYLOAD WHERE HASH NOT IN (SELECT PAYLOAD_HASH FROM IOV)")
+        connection.execute("UPDATE TAG SET DESCRIPTION = ? WHERE NAME = ?", ("%s%s"%(HASH_PREFIX, inputHash), outputTag))
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(tmpFile, outputFile)
+    return outputFile
+
+##-- Payloads are boost portable binary archives: a 0x7F byte and the boost library version, then every integer as a signed byte
+##-- holding its number of bytes (negative for a negative value, 0 for the value 0) followed by the bytes in little endian.
+##-- A true bool is written as the integer 0x54 ('T'), a false bool as 0
+class PortableArchive:
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.position = 0
+        if(len(self.data) == 0 or self.data[0] != 0x7F):
+            raise ValueError("Payload is not a portable binary archive")
+        self.position = 1
+        self.libraryVersion = self.ReadInteger()
+
+    def ReadInteger(self):
+        size = self.data[self.position]
+        size = size - 256 if size > 127 else size
+        start = self.position + 1
+        self.position = start + abs(size)
+        if(self.position > len(self.data)):
+            raise ValueError("Payload ends inside an integer at byte %s"%(start - 1))
+        value = int.from_bytes(self.data[start:self.position], "little")
+        return -value if size < 0 else value
+
+    def ReadBool(self):
+        return self.ReadInteger() != 0
+
+    ##-- Tracking level and version written before the first object of each class
+    def ReadClassInfo(self):
+        return self.ReadInteger(), self.ReadInteger()
+
+    ##-- std::map<uint32_t, T>: size, item version, pair class info, then key and value of each item. Keys are returned as an array
+    def ReadMap(self, ReadValue):
+        self.ReadClassInfo()
+        N_items = self.ReadInteger()
+        self.ReadInteger()
+        keys, values = np.empty(N_items, dtype = np.uint32), []
+        for i in range(N_items):
+            if(i == 0):
+                self.ReadClassInfo()
+            keys[i] = self.ReadInteger()
+            values.append(ReadValue(i))
+        return keys, values
+
+    def AtEnd(self):
+        return self.position == len(self.data)
+
+##-- EcalTPGTPMode members, in their serialization order. The last four are not set by the TPModes/input text files
+TPMODE_BOOL_FIELDS = ["EnableEBOddFilter", "EnableEEOddFilter", "EnableEBOddPeakFinder", "EnableEEOddPeakFinder", "DisableEBEvenPeakFinder", "DisableEEEvenPeakFinder"]
+TPMODE_INT_FIELDS = ["FenixEBStripOutput", "FenixEEStripOutput", "FenixEBStripInfobit2", "FenixEEStripInfobit2", "EBFenixTcpOutput", "EBFenixTcpInfobit1",
+                     "EEFenixTcpOutput", "EEFenixTcpInfobit1", "FenixPar15", "FenixPar16", "FenixPar17", "FenixPar18"]
+
+##-- EcalTPGOddWeightGroup (EcalTPGGroups base): strip ID -> weight group, as the weights/input group files
+def DecodeOddWeightGroup(archive):
+    archive.ReadClassInfo()
+    archive.ReadClassInfo()
+    stripids, groups = archive.ReadMap(lambda i : archive.ReadInteger())
+    return {"stripid" : stripids, "group" : np.array(groups, dtype = np.uint32)}
+
+##-- EcalTPGOddWeightIdMap: weight group -> 5 encoded weights (EcalTPGWeights w0-w4), as the rows of the weights/input weight files
+def DecodeOddWeightIdMap(archive):
+    archive.ReadClassInfo()
+    def ReadWeights(i):
+        if(i == 0):
+            archive.ReadClassInfo()
+        return [archive.ReadInteger() for w in range(5)]
+    groups, weights = archive.ReadMap(ReadWeights)
+    return {"group" : groups, "weights" : np.array(weights, dtype = np.uint32).reshape(-1, 5)}
+
+def DecodeTPMode(archive):
+    archive.ReadClassInfo()
+    TPMode = {field : int(archive.ReadBool()) for field in TPMODE_BOOL_FIELDS}
+    TPMode.update({field : archive.ReadInteger() for field in TPMODE_INT_FIELDS})
+    return TPMode
+
+PAYLOAD_DECODERS = {
+    "EcalTPGOddWeightGroup" : DecodeOddWeightGroup,
+    "EcalTPGOddWeightIdMap" : DecodeOddWeightIdMap,
+    "EcalTPGTPMode" : DecodeTPMode,
+}
+
+##-- Content of a payload blob as a dict of values / arrays
+def DecodePayload(objectType, data):
+    if(objectType not in PAYLOAD_DECODERS):
+        raise KeyError("No decoder for payload type %s, known types: %s"%(objectType, list(PAYLOAD_DECODERS.keys())))
+    archive = PortableArchive(data)
+    content = PAYLOAD_DECODERS[objectType](archive)
+    if(not archive.AtEnd()):
+        raise ValueError("%s payload: %s bytes left after decoding"%(objectType, len(archive.data) - archive.position))
+    return content
+
+def ReadRows(dbFile, query):
+    if(not os.path.isfile(dbFile)):
+        raise FileNotFoundError("SQLite file %s not found"%(dbFile))
+    connection = sqlite3.connect(dbFile)
+    connection.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in connection.execute(query)]
+    finally:
+        connection.close()
+
+def ReadTags(dbFile):
+    return ReadRows(dbFile, "SELECT NAME, TIME_TYPE, OBJECT_TYPE, SYNCHRONIZATION, DESCRIPTION, INSERTION_TIME FROM TAG ORDER BY NAME")
+
+##-- IOVs of all tags with their payload. With withData = False, the payload blobs are not read
+def ReadIOVs(dbFile, withData = True):
+    return ReadRows(dbFile, "SELECT IOV.TAG_NAME, IOV.SINCE, IOV.PAYLOAD_HASH, IOV.INSERTION_TIME, PAYLOAD.OBJECT_TYPE%s FROM IOV "
+                            "JOIN PAYLOAD ON PAYLOAD.HASH = IOV.PAYLOAD_HASH ORDER BY IOV.TAG_NAME, IOV.SINCE, IOV.INSERTION_TIME"%(", PAYLOAD.DATA" if withData else ""))
+
+def ReadPayload(dbFile, payloadHash):
+    rows = ReadRows(dbFile, "SELECT OBJECT_TYPE, DATA FROM PAYLOAD WHERE HASH = '%s'"%(payloadHash))
+    if(len(rows) == 0):
+        raise KeyError("Payload %s not found in %s"%(payloadHash, dbFile))
+    return rows[0]["OBJECT_TYPE"], rows[0]["DATA"]
+
+##-- Differences between two decoded payloads of the same type, as printable lines
+def DiffPayloads(contentA, contentB):
+    if(contentA.keys() != contentB.keys()):
+        return ["different members: %s / %s"%(list(contentA.keys()), list(contentB.keys()))]
+    if("stripid" in contentA or "weights" in contentA):
+        keyName, valueName = ("stripid", "group") if "stripid" in contentA else ("group", "weights")
+        valuesA = dict(zip(contentA[keyName].tolist(), contentA[valueName].tolist()))
+        valuesB = dict(zip(contentB[keyName].tolist(), contentB[valueName].tolist()))
+        differences = ["%s %s only in first file"%(keyName, key) for key in sorted(valuesA.keys() - valuesB.keys())]
+        differences += ["%s %s only in second file"%(keyName, key) for key in sorted(valuesB.keys() - valuesA.keys())]
+        differences += ["%s %s: %s %s / %s"%(keyName, key, valueName, valuesA[key], valuesB[key]) for key in sorted(valuesA.keys() & valuesB.keys()) if valuesA[key] != valuesB[key]]
+        return differences
+    return ["%s: %s / %s"%(field, contentA[field], contentB[field]) for field in contentA if contentA[field] != contentB[field]]
+
+##-- IOVs in effect: when a since was appended several times (SinceAppendMode), the last inserted payload is the one read
+def EffectiveIOVs(iovs):
+    effective = {}
+    for iov in iovs:
+        effective[(iov["TAG_NAME"], iov["SINCE"])] = iov
+    return list(effective.values())
+
+##-- Compare the IOVs in effect of two files, in (tag, since) order: payloads with the same hash are equal without being read, the
+##-- others are decoded and compared. Payloads with different hashes can have the same content, e.g. when written by two boost versions
+def DiffConditions(dbFileA, dbFileB):
+    iovsA, iovsB = EffectiveIOVs(ReadIOVs(dbFileA, withData = False)), EffectiveIOVs(ReadIOVs(dbFileB, withData = False))
+    differences = []
+    if(len(iovsA) != len(iovsB)):
+        differences.append("%s IOVs / %s IOVs"%(len(iovsA), len(iovsB)))
+    for iovA, iovB in zip(iovsA, iovsB):
+        name = "%s since %s / %s since %s"%(iovA["TAG_NAME"], iovA["SINCE"], iovB["TAG_NAME"], iovB["SINCE"])
+        if(iovA["PAYLOAD_HASH"] == iovB["PAYLOAD_HASH"]):
+            continue
+        if(iovA["OBJECT_TYPE"] != iovB["OBJECT_TYPE"]):
+            differences.append("%s: payload types %s / %s"%(name, iovA["OBJECT_TYPE"], iovB["OBJECT_TYPE"]))
+            continue
+        contentA = DecodePayload(*ReadPayload(dbFileA, iovA["PAYLOAD_HASH"]))
+        contentB = DecodePayload(*ReadPayload(dbFileB, iovB["PAYLOAD_HASH"]))
+        differences += ["%s: %s"%(name, difference) for difference in DiffPayloads(contentA, contentB)]
+    return differences
+
+##-- pyCfgParams of ETTAnalyzer_cfg_12_3_0.py naming a conditions SQLite file. They are only read with OverrideWeights=1
+CONDITIONS_PARAMS = ["OddWeightsSqliteFile", "OddWeightsGroupSqliteFile", "TPModeSqliteFile"]
+CONDITIONS_DIRECTORIES = ["weights/output", "weights/output_extra", "TPModes/output", "TPModes/output_extra"]
+
+##-- Content key of a conditions file: the tags, sinces and payload hashes of its IOVs in effect. Copies of a file, or files written
+##-- again from the same inputs, have the same key
+def ConditionsKey(dbFile):
+    sha1 = hashlib.sha1()
+    for iov in sorted(EffectiveIOVs(ReadIOVs(dbFile, withData = False)), key = lambda iov : (iov["TAG_NAME"], iov["SINCE"])):
+        sha1.update(("%s %s %s\n"%(iov["TAG_NAME"], iov["SINCE"], iov["PAYLOAD_HASH"])).encode())
+    return sha1.hexdigest()
+
+##-- Copy a conditions file to the store, as <key>.db, unless a file with the same content is already there
+def StoreConditions(dbFile, storeDirectory):
+    os.makedirs(storeDirectory, exist_ok = True)
+    storedFile = os.path.join(storeDirectory, "%s.db"%(ConditionsKey(dbFile)))
+    if(not os.path.isfile(storedFile)):
+        tmpFile = "%s.tmp%s"%(storedFile, os.getpid())
+        shutil.copyfile(dbFile, tmpFile)
+        os.replace(tmpFile, storedFile)
+    return storedFile
+
+##-- Conditions file of a pyCfgParams value: a path relative to baseDirectory, or a file name (with or without .db) in CONDITIONS_DIRECTORIES
+def FindConditionsFile(value, baseDirectory):
+    names = [value] if value.endswith(".db") else [value, "%s.db"%(value)]
+    candidates = [os.path.join(baseDirectory, name) for name in names]
+    candidates += [os.path.join(baseDirectory, directory, os.path.basename(name)) for directory in CONDITIONS_DIRECTORIES for name in names]
+    for candidate in candidates:
+        if(os.path.isfile(candidate)):
+            return candidate
+    raise FileNotFoundError("No conditions file for '%s', looked for: %s"%(value, candidates))
+
+##-- Conditions files actually read by a pyCfgParams set, each stored once in storeDirectory. Returns the pyCfgParams with the file
+##-- names as they are in the CRAB sandbox (input files are copied to the job directory), and the files to add to JobType.inputFiles
+def BuildConditionsSandbox(pyCfgParams, baseDirectory, storeDirectory):
+    params = dict(param.split("=", 1) for param in pyCfgParams)
+    if(int(params.get("OverrideWeights", 0)) == 0):
+        return list(pyCfgParams), []
+
+    sandboxParams, inputFiles = [], []
+    for param in pyCfgParams:
+        name, value = param.split("=", 1)
+        if(name in CONDITIONS_PARAMS):
+            storedFile = StoreConditions(FindConditionsFile(value, baseDirectory), storeDirectory)
+            if(storedFile not in inputFiles):
+                inputFiles.append(storedFile)
+            param = "%s=%s"%(name, os.path.basename(storedFile))
+        sandboxParams.append(param)
+    return sandboxParams, inputFiles
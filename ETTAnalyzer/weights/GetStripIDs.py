@@ -2,45 +2,153 @@
 4 February 2022 
 Abraham Tishelman-Charny 
 
-The purpose of this module is to get column stripID values from DOF csv files.
+The purpose of this module is to get column stripID values from DOF csv files, and to assign a weight group to each strip.
+
+Weight groups are assigned with a rule:
+    region: EB strips -> --EBGroup, EE strips -> --EEGroup (OneEBOneEEset.txt)
+    ring:   EB strips -> one group per --ringWidth rings of |ieta|, EE strips -> the next group
+    tcc:    one group per TCC, from the TCC column of the DOF files
+and an optional table of "stripid group" lines which overrides the rule for the strips it lists. Strips of --addStrips files
+(e.g. MissingStripIDs.log) that are not in the DOF files are added with --addStripsGroup. The coverage of every --checkStrips file is reported.
 
 Example usage:
 python3 GetStripIDs.py 
+python3 GetStripIDs.py --addStrips ../MissingStripIDs.log --addStripsGroup 0 --outName OneEBOneEEset_adding2021Strips.txt
+python3 GetStripIDs.py --rule ring --ringWidth 5 --outName EBRings.txt --checkStrips ../MissingStripIDs.log
 """
 
+import argparse
+import re
+import numpy as np 
 import pandas as pd
 
+TCC_COLUMNS = ["tcc", "TCC", "tccid", "TCCid"]
+MISSING_STRIP_PATTERN = re.compile(r"could not find EcalTPGGroupsMap entry for (\d+)")
+
+def GetOptions():
+    d = '/afs/cern.ch/work/a/atishelm/private/ecall1algooptimization/PileupMC/parameters/'
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--EB_f", type = str, default = '{d}/DOF_EB_2018.csv'.format(d=d), help = "EB DOF csv file")
+    parser.add_argument("--EE_f", type = str, default = '{d}/DOF_EE_2018.csv'.format(d=d), help = "EE DOF csv file")
+    parser.add_argument("--rule", type = str, default = "region", choices = ["region", "ring", "tcc"], help = "Weight group rule")
+    parser.add_argument("--EBGroup", type = int, default = 0, help = "region rule: weight group of EB strips")
+    parser.add_argument("--EEGroup", type = int, default = 1, help = "region rule: weight group of EE strips")
+    parser.add_argument("--ringWidth", type = int, default = 1, help = "ring rule: number of |ieta| rings per weight group")
+    parser.add_argument("--table", type = str, default = None, help = "File of 'stripid group' lines overriding the rule")
+    parser.add_argument("--addStrips", type = str, nargs = "+", default = [], help = "Strip lists (text or cmsRun logs) of strips to add if they are not in the DOF files")
+    parser.add_argument("--addStripsGroup", type = int, default = 0, help = "Weight group of the --addStrips strips")
+    parser.add_argument("--checkStrips", type = str, nargs = "+", default = [], help = "Strip lists (text or cmsRun logs) whose coverage is checked")
+    parser.add_argument("--outName", type = str, default = "OneEBOneEEset.txt", help = "Output text file")
+    return parser.parse_args()
+
 def AppendStripIDs(f_):
+    df = pd.read_csv(f_, usecols = ["stripid"])
+    stripIDs_ = pd.unique(df["stripid"]).tolist() # unique strip IDs in order of first appearance 
+    return stripIDs_
+
+##-- One row per strip (first crystal of the strip in the DOF file), EB strips first, in order of first appearance 
+def ReadStrips(EB_f, EE_f):
+    strips = []
+    for subdet, f_ in [("EB", EB_f), ("EE", EE_f)]:
+        df = pd.read_csv(f_)
+        df = df.drop_duplicates("stripid", keep = "first")
+        df["subdet"] = subdet
+        strips.append(df)
+    strips = pd.concat(strips, ignore_index = True)
+    N_shared = int(strips["stripid"].duplicated().sum())
+    if(N_shared > 0):
+        print("Warning: %s strip IDs are in both the EB and EE DOF files, they are written twice"%(N_shared))
+    return strips
+
+##-- Strip IDs from a text file: "could not find EcalTPGGroupsMap entry for N" lines of a cmsRun log, or the first column of the other lines 
+def ReadStripList(f_):
     stripIDs_ = []
-    df = pd.read_csv(f_)
-    AllstripIDs = df["stripid"]
-    for stripID in AllstripIDs:
-        if(stripID not in stripIDs_):
-            stripIDs_.append(stripID)
+    for line in open(f_):
+        line = line.strip()
+        if(line == "" or line.startswith("#")):
+            continue
+        match = MISSING_STRIP_PATTERN.search(line)
+        if(match is not None):
+            stripIDs_.append(int(match.group(1)))
+        elif(line.split()[0].isdigit()):
+            stripIDs_.append(int(line.split()[0]))
+    return np.array(pd.unique(np.array(stripIDs_, dtype = np.int64)), dtype = np.int64)
 
-    return stripIDs_
+##-- Weight group of each strip from a rule 
+def AssignGroups(strips, rule, EBGroup = 0, EEGroup = 1, ringWidth = 1):
+    isEB = (strips["subdet"] == "EB").to_numpy()
+    if(rule == "region"):
+        groups = np.where(isEB, EBGroup, EEGroup)
+    elif(rule == "ring"):
+        rings = (np.abs(strips["ieta"].fillna(1).to_numpy().astype(np.int64)) - 1) // ringWidth # |ieta| = 1..85 
+        N_EB_groups = rings[isEB].max() + 1 if isEB.any() else 0
+        groups = np.where(isEB, rings, N_EB_groups)
+    elif(rule == "tcc"):
+        tccColumns = [column for column in TCC_COLUMNS if column in strips.columns]
+        if(len(tccColumns) == 0):
+            raise KeyError("The tcc rule needs a TCC column (one of %s) in the DOF files. Columns: %s"%(TCC_COLUMNS, list(strips.columns)))
+        tccs = strips[tccColumns[0]].to_numpy()
+        if(pd.isnull(tccs).any()):
+            raise ValueError("%s strips have no TCC"%(int(pd.isnull(tccs).sum())))
+        _, groups = np.unique(tccs, return_inverse = True) # one group per TCC, in TCC order 
+    else:
+        raise ValueError("Unknown weight group rule: %s"%(rule))
+    return np.asarray(groups, dtype = np.int64)
+
+##-- Override the groups of the strips listed in a "stripid group" table. Every strip of the table must exist 
+def ApplyGroupTable(strips, groups, table):
+    tableDF = pd.read_csv(table, sep = r"\s+", header = None, names = ["stripid", "group"], comment = "#")
+    if(tableDF["stripid"].duplicated().any()):
+        raise ValueError("Strips listed more than once in %s: %s"%(table, tableDF.loc[tableDF["stripid"].duplicated(), "stripid"].tolist()[:10]))
+    positions = pd.Index(tableDF["stripid"]).get_indexer(strips["stripid"])
+    unknown = ~tableDF["stripid"].isin(strips["stripid"]).to_numpy()
+    if(unknown.any()):
+        raise ValueError("%s strips of %s are not in the DOF files, e.g. %s. Add them with --addStrips"%(int(unknown.sum()), table, tableDF["stripid"][unknown].tolist()[:10]))
+    groups = groups.copy()
+    groups[positions >= 0] = tableDF["group"].to_numpy()[positions[positions >= 0]]
+    print("%s strips assigned from %s"%(int((positions >= 0).sum()), table))
+    return groups
+
+##-- Strips of a list that are not assigned a group 
+def CheckCoverage(strips, stripIDs_, name):
+    missing = stripIDs_[~np.isin(stripIDs_, strips["stripid"].to_numpy())]
+    print("%s: %s / %s strips have a weight group"%(name, len(stripIDs_) - len(missing), len(stripIDs_)))
+    if(len(missing) > 0):
+        print("    missing: %s"%(missing.tolist()))
+    return missing
+
+##-- "stripid<tab>group" lines. Added strips are separated by two spaces, as the hand-added lines of OneEBOneEEset_adding2021Strips.txt 
+def WriteGroupFile(strips, groups, outName):
+    with open(outName, 'w') as f:
+        for stripID, subdet, group in zip(strips["stripid"].tolist(), strips["subdet"].tolist(), groups.tolist()):
+            separator = "  " if subdet == "added" else "\t"
+            f.write("{stripID}{separator}{group}\n".format(stripID=stripID, separator=separator, group=group))
+    print("Wrote output file:",outName)
 
 if(__name__ == '__main__'):
 
-    d = '/afs/cern.ch/work/a/atishelm/private/ecall1algooptimization/PileupMC/parameters/'
-    EE_f = '{d}/DOF_EE_2018.csv'.format(d=d)
-    EB_f = '{d}/DOF_EB_2018.csv'.format(d=d)
+    args = GetOptions()
+    strips = ReadStrips(args.EB_f, args.EE_f)
+    print("len(EB_stripIDs):",int((strips["subdet"] == "EB").sum()))
+    print("len(EE_stripIDs):",int((strips["subdet"] == "EE").sum()))
 
-    EB_stripIDs = AppendStripIDs(EB_f)
-    EE_stripIDs = AppendStripIDs(EE_f)
+    groups = AssignGroups(strips, args.rule, args.EBGroup, args.EEGroup, args.ringWidth)
 
-    print("len(EB_stripIDs):",len(EB_stripIDs))
-    print("len(EE_stripIDs):",len(EE_stripIDs))
+    # Strips missing from the DOF files, added after the EB strips and before the EE strips, as in OneEBOneEEset_adding2021Strips.txt 
+    for addStrips in args.addStrips:
+        stripIDs_ = ReadStripList(addStrips)
+        newStripIDs = stripIDs_[~np.isin(stripIDs_, strips["stripid"].to_numpy())]
+        print("Adding %s strips of %s to group %s"%(len(newStripIDs), addStrips, args.addStripsGroup))
+        position = int((strips["subdet"] != "EE").sum()) # after the EB strips and the strips added before 
+        newStrips = pd.DataFrame({"stripid" : newStripIDs, "subdet" : "added"})
+        strips = pd.concat([strips.iloc[:position], newStrips, strips.iloc[position:]], ignore_index = True)
+        groups = np.concatenate((groups[:position], np.full(len(newStripIDs), args.addStripsGroup, dtype = np.int64), groups[position:]))
 
-    outName = "OneEBOneEEset.txt"
+    if(args.table is not None):
+        groups = ApplyGroupTable(strips, groups, args.table)
 
-    with open(outName, 'w') as f:
-        for EB_stripID in EB_stripIDs:
-            line = "{EB_stripID}\t0\n".format(EB_stripID=EB_stripID) # assign EB strips weight group 0 
-            f.write(line)
-        for EE_stripID in EE_stripIDs: 
-            line = "{EE_stripID}\t1\n".format(EE_stripID=EE_stripID) # assign EE strips weight group 1 
-            f.write(line)            
-        
-    f.close()
-    print("Wrote output file:",outName)
\ No newline at end of file
+    for checkStrips in args.checkStrips:
+        CheckCoverage(strips, ReadStripList(checkStrips), checkStrips)
+
+    print("Weight groups:", dict(zip(*[values.tolist() for values in np.unique(groups, return_counts = True)])))
+    WriteGroupFile(strips, groups, args.outName)
@@ -0,0 +1,64 @@
+"""
+18 October 2026
+
+The purpose of this module is to inspect conditions SQLite files (weights/output, weights/output_extra, TPModes/output) without CMSSW:
+list their tags, IOVs and decoded payloads, or compare them to a reference file.
+
+Example usage:
+cd ETTAnalyzer/ETTAnalyzer/weights
+python3 InspectConditions.py output/MinDelta_2p5Prime_OddWeights.db ../TPModes/output/EcalTPG_TPMode_Tagging.db # tags, IOVs and payload contents
+python3 InspectConditions.py output/*.db output_extra/*.db --diff output/OneEBOneEEset.db # which files differ from the reference, and how
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from CondDB_Tools import ReadTags, ReadIOVs, DecodePayload, DiffConditions
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dbFiles", type = str, nargs = "+", help = "Conditions SQLite files")
+    parser.add_argument("--diff", type = str, default = None, help = "Reference SQLite file to compare the files to")
+    parser.add_argument("--maxLines", type = int, default = 10, help = "Maximum number of printed differences / map items per payload")
+    return parser.parse_args()
+
+def PrintPayload(content, maxLines):
+    for name, value in content.items():
+        if(isinstance(value, np.ndarray)):
+            print("    %s: %s rows, %s distinct"%(name, len(value), len(np.unique(value, axis = 0))))
+            for row in value[:maxLines]:
+                print("      %s"%(row))
+            if(len(value) > maxLines):
+                print("      ...")
+        else:
+            print("    %s: %s"%(name, value))
+
+def ListConditions(dbFile, maxLines):
+    print("=" * 80)
+    print(dbFile)
+    for tag in ReadTags(dbFile):
+        print("  TAG %s: %s, %s, description '%s'"%(tag["NAME"], tag["OBJECT_TYPE"], tag["TIME_TYPE"], tag["DESCRIPTION"]))
+    for iov in ReadIOVs(dbFile):
+        print("  IOV %s since %s: payload %s (%s, %s bytes)"%(iov["TAG_NAME"], iov["SINCE"], iov["PAYLOAD_HASH"], iov["OBJECT_TYPE"], len(iov["DATA"])))
+        PrintPayload(DecodePayload(iov["OBJECT_TYPE"], iov["DATA"]), maxLines)
+
+if(__name__ == '__main__'):
+    args = GetOptions()
+    if(args.diff is None):
+        for dbFile in args.dbFiles:
+            ListConditions(dbFile, args.maxLines)
+        sys.exit(0)
+
+    N_different = 0
+    for dbFile in args.dbFiles:
+        differences = DiffConditions(args.diff, dbFile)
+        N_different += len(differences) > 0
+        print("%s: %s"%(dbFile, "%s differences"%(len(differences)) if len(differences) > 0 else "same conditions"))
+        for difference in differences[:args.maxLines]:
+            print("  %s"%(difference))
+        if(len(differences) > args.maxLines):
+            print("  ...")
+    print("%s / %s files differ from %s"%(N_different, len(args.dbFiles), args.diff))
+    sys.exit(1 if N_different > 0 else 0)
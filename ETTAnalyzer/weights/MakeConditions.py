@@ -0,0 +1,95 @@
+"""
+18 October 2026
+
+The purpose of this module is to (re)create all the conditions SQLite files of a manifest with a single cmsRun process.
+Each manifest line gives an input text file, a record, a tag and an output SQLite file. Outputs whose stored input hash
+(input text file, record and tag) matches are skipped. The others are written by updateTPGConditions.py as tags of one
+staging file, which is then split into the output files.
+
+Example usage:
+cd ETTAnalyzer/ETTAnalyzer/weights
+cmsenv
+python3 MakeConditions.py --manifest conditions_manifest.txt
+python3 MakeConditions.py --manifest conditions_manifest.txt --dryRun # only list the outputs to (re)create
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+from CondDB_Tools import ReadManifest, InputHash, IsUpToDate, ExtractTag, RECORD_ANALYZERS
+
+CONFIGURATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "updateTPGConditions.py")
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--manifest", type = str, default = "conditions_manifest.txt", help = "Manifest with one 'input record tag output' line per conditions file")
+    parser.add_argument("--stagingDir", type = str, default = "staging", help = "Directory of the job manifest and staging SQLite file")
+    parser.add_argument("--cmsRun", type = str, default = "cmsRun", help = "cmsRun executable")
+    parser.add_argument("--force", action = "store_true", help = "Recreate all outputs, even up to date ones")
+    parser.add_argument("--dryRun", action = "store_true", help = "Print the outputs to recreate and the cmsRun command without running it")
+    parser.add_argument("--keepStaging", action = "store_true", help = "Keep the staging directory after the outputs are written")
+    return parser.parse_args()
+
+##-- Entries whose output is missing or was made from another input
+def GetPendingEntries(entries, force = False):
+    pending = []
+    for entry in entries:
+        if(not os.path.isfile(entry["input"])):
+            raise FileNotFoundError("Input file %s not found"%(entry["input"]))
+        entry["inputHash"] = InputHash(entry)
+        if(force or not IsUpToDate(entry["output"], entry["tag"], entry["inputHash"])):
+            pending.append(entry)
+        else:
+            print("Up to date: %s"%(entry["output"]))
+    return pending
+
+##-- Job manifest read by updateTPGConditions.py. Each condition gets a unique staging tag, as several outputs can share a tag name
+def WriteJobManifest(pending, stagingDir):
+    jobManifest = os.path.join(stagingDir, "jobManifest.txt")
+    with open(jobManifest, "w") as f:
+        for i, entry in enumerate(pending):
+            entry["stagingTag"] = "%s__%s"%(entry["tag"], i)
+            f.write("%s %s %s %s\n"%(entry["input"], entry["record"], RECORD_ANALYZERS[entry["record"]], entry["stagingTag"]))
+    return jobManifest
+
+def main():
+    args = GetOptions()
+    entries = ReadManifest(args.manifest)
+    pending = GetPendingEntries(entries, args.force)
+    print("%s / %s conditions files to create"%(len(pending), len(entries)))
+    if(len(pending) == 0):
+        print("DONE")
+        return
+
+    stagingDir = os.path.abspath(args.stagingDir)
+    os.makedirs(stagingDir, exist_ok = True)
+    jobManifest = WriteJobManifest(pending, stagingDir)
+    stagingFile = os.path.join(stagingDir, "staging.db")
+    if(os.path.isfile(stagingFile)):
+        os.remove(stagingFile) # tags of a previous job would get new IOVs appended
+    command = [args.cmsRun, CONFIGURATION, "manifest=%s"%(jobManifest), "staging=%s"%(stagingFile)]
+
+    for entry in pending:
+        print("To create: %s (%s, tag %s) from %s"%(entry["output"], entry["record"], entry["tag"], entry["input"]))
+    print("Command: %s"%(" ".join(command)))
+    if(args.dryRun):
+        return
+
+    returnCode = subprocess.call(command, cwd = stagingDir)
+    if(returnCode != 0):
+        print("ERROR: cmsRun exited with code %s, no output was written. Staging files kept in %s"%(returnCode, stagingDir))
+        sys.exit(returnCode)
+
+    for entry in pending:
+        ExtractTag(stagingFile, entry["stagingTag"], entry["output"], entry["tag"], entry["inputHash"])
+        print("Wrote %s"%(entry["output"]))
+
+    if(not args.keepStaging):
+        shutil.rmtree(stagingDir)
+    print("DONE")
+
+if(__name__ == '__main__'):
+    main()
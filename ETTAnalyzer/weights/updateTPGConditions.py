@@ -0,0 +1,102 @@
+"""
+18 October 2026
+
+The purpose of this CMSSW configuration file is to create many conditions in one cmsRun process, instead of one cmsRun per
+updateTPGOddWeightGroup.py / updateTPGOddWeightIdMap.py / updateTPGTPMode.py call. One PopCon analyzer is scheduled per line of the
+job manifest, and all conditions are written as separate tags of one staging SQLite file, which MakeConditions.py then splits into
+one SQLite file per condition.
+
+This configuration is run by MakeConditions.py, which writes the job manifest (one "input record analyzer tag" line per condition).
+
+Example usage:
+cd ETTAnalyzer/ETTAnalyzer/weights
+cmsenv
+cmsRun updateTPGConditions.py manifest=staging/jobManifest.txt staging=staging/staging.db
+
+"""
+
+import FWCore.ParameterSet.Config as cms
+import FWCore.ParameterSet.VarParsing as VarParsing
+
+##-- Options that can be set on the command line
+options = VarParsing.VarParsing('analysis')
+
+options.register ('manifest', # job manifest written by MakeConditions.py
+                'staging/jobManifest.txt',
+                VarParsing.VarParsing.multiplicity.singleton,
+                VarParsing.VarParsing.varType.string,
+                "manifest")
+options.register ('staging', # output file with SQLite format, one tag per condition
+                'staging/staging.db',
+                VarParsing.VarParsing.multiplicity.singleton,
+                VarParsing.VarParsing.varType.string,
+                "staging")
+
+options.parseArguments()
+
+conditions = []
+for line in open(options.manifest):
+    if(line.strip() == ""):
+        continue
+    inputFile, record, analyzer, tag = line.split()
+    conditions.append((inputFile, record, analyzer, tag))
+
+process = cms.Process("ProcessOne")
+
+process.MessageLogger = cms.Service("MessageLogger",
+    cerr = cms.untracked.PSet(
+        enable = cms.untracked.bool(False)
+    ),
+    cout = cms.untracked.PSet(
+        enable = cms.untracked.bool(True),
+        threshold = cms.untracked.string('INFO')
+    ),
+    debugModules = cms.untracked.vstring('*')
+)
+
+process.source = cms.Source("EmptyIOVSource",
+    lastValue = cms.uint64(100000000000),
+    timetype = cms.string('runnumber'),
+    firstValue = cms.uint64(100000000000),
+    interval = cms.uint64(1)
+)
+
+process.load("CondCore.CondDB.CondDB_cfi")
+
+process.CondDB.connect = 'sqlite_file:%s'%(options.staging)
+
+##-- The record string of toPut is the key the analyzer uses to find its tag, so each condition gets its own key, <record>_<index>
+process.PoolDBOutputService = cms.Service("PoolDBOutputService",
+  process.CondDB,
+  logconnect = cms.untracked.string('sqlite_file:log.db'),
+  toPut = cms.VPSet([
+    cms.PSet(
+      record = cms.string('%s_%s'%(record, i)),
+      tag = cms.string(tag)
+    ) for i, (inputFile, record, analyzer, tag) in enumerate(conditions)
+  ])
+)
+
+process.p = cms.Path()
+for i, (inputFile, record, analyzer, tag) in enumerate(conditions):
+  analyzerModule = cms.EDAnalyzer(analyzer,
+    record = cms.string('%s_%s'%(record, i)),
+    loggingOn= cms.untracked.bool(True),
+    IsDestDbCheckedInQueryLog=cms.untracked.bool(True),
+    SinceAppendMode=cms.bool(True),
+    Source=cms.PSet(
+      firstRun = cms.string('1'),
+      lastRun = cms.string('10'),
+      OnlineDBSID = cms.string(''),
+      OnlineDBUser = cms.string(''),
+      OnlineDBPassword = cms.string(''),
+      LocationSource = cms.string(''),
+      Location = cms.string(''),
+      GenTag = cms.string(''),
+      RunType = cms.string(''),
+      fileType = cms.string('txt'),
+      fileName = cms.string(inputFile),
+    )
+  )
+  setattr(process, "Condition%s"%(i), analyzerModule)
+  process.p += analyzerModule
@@ -7,20 +7,30 @@ Simplified version of WRS encoding script to derive FENIX encoded weights.
 Original code by William Richard Smith (2019) here: https://gitlab.cern.ch/cms-ecal-dpg/ecall1algooptimization/-/blob/942db3e6cac733e9684a42e7d2b314572ed14129/PileupMC/weights_encoder.py
 
 This script simulates the loss of precision in decimal weights given by the encoding. 
+
+It can be imported without side effects: the *_array functions encode and decode many weight sets of shape (N, 5) at once.
+
+Example usage:
+python3 weights_encoder.py --DecimalWeights=-0.703125,0,-0.546875,0.984375,0.265625
+
+from weights_encoder import decimal_to_encoded_array, encoded_to_decimal_array, best_encoded_weights
+EncodedWeights = decimal_to_encoded_array(DecimalWeights) # (N, 5) decimal weights -> (N, 5) encoded weights 
+EncodedWeights, violations = best_encoded_weights(DecimalWeights, target_sum = 0) # closest encoding whose weights sum to 0 
 '''
 
 import argparse
+import itertools
 import numpy as np 
 from matplotlib import pyplot as plt 
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--DecimalWeights", type=str, required=True, help="Comma separated list of input decimal weights to encode.")
-args = parser.parse_args()
+N_WEIGHTS = 5
+MIN_ENCODED, MAX_ENCODED = -64, 63 # signed range of the 7 bit weights, in units of 1/64 
 
-DecimalWeights = [float(w_) for w_ in args.DecimalWeights.split(',')]
-N_weights = len(DecimalWeights)
-if(N_weights != 5):
-    raise Exception("Number of weights must equal 5 - Exiting")
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--DecimalWeights", type=str, required=True, help="Comma separated list of input decimal weights to encode.")
+    args = parser.parse_args()
+    return args
 
 #Encoded weights back to decimals to look at differences
 def encoded_to_decimal(enc_weights_not_corrected):
@@ -50,6 +60,63 @@ def decimal_to_encoded(weights):
             
     return enc_weights_not_corrected
 
+def check_weight_sets(weights):
+    if(weights.ndim == 0 or weights.shape[-1] != N_WEIGHTS):
+        raise ValueError("Weight sets must have %s weights, got shape %s"%(N_WEIGHTS, weights.shape))
+
+# Same as encoded_to_decimal for arrays of weight sets, shape (N, 5) or (5,) 
+def encoded_to_decimal_array(enc_weights):
+    enc_weights = np.asarray(enc_weights)
+    check_weight_sets(enc_weights)
+    signed_weights = np.where(enc_weights > 63, enc_weights - 128, enc_weights) # 7 bit two's complement 
+    return signed_weights / 64
+
+# Same as decimal_to_encoded for arrays of weight sets, shape (N, 5) or (5,). np.rint rounds half to even like round(), 
+# and negative weights are encoded as 128 - |w*64|, so a negative weight rounding to 0 is encoded as 128, as in decimal_to_encoded 
+def decimal_to_encoded_array(weights):
+    weights = np.asarray(weights, dtype = np.float64)
+    check_weight_sets(weights)
+    magnitudes = np.rint(np.abs(weights * 64)).astype(np.int64)
+    return np.where(weights < 0, 128 - magnitudes, magnitudes)
+
+# All (2*max_shift+1)^5 offsets of the neighbour search, the ones changing the fewest weights first 
+def neighbour_offsets(max_shift = 1):
+    offsets = np.array(list(itertools.product(range(-max_shift, max_shift + 1), repeat = N_WEIGHTS)), dtype = np.int64)
+    order = np.argsort(np.abs(offsets).sum(axis = 1), kind = "stable")
+    return offsets[order]
+
+# Best encoding of each decimal weight set among the +-max_shift LSB neighbours of the rounded (and saturated) weights: 
+# the weights must be in the 7 bit range, then the signed sum closest to target_sum (units of 1/64, None: no constraint) is chosen, 
+# then the smallest quantization error sum((encoded/64 - w)^2). Ties go to the candidate changing the fewest weights. 
+# Returns the encoded weight sets (N, 5) and the remaining |sum - target_sum| of each set (0 if the constraint is met) 
+def best_encoded_weights(weights, target_sum = 0, max_shift = 1, batch_size = 10000):
+    weights = np.asarray(weights, dtype = np.float64)
+    check_weight_sets(weights)
+    single_set = weights.ndim == 1
+    weights = weights.reshape(-1, N_WEIGHTS)
+    offsets = neighbour_offsets(max_shift)
+
+    signed = np.empty(weights.shape, dtype = np.int64)
+    violations = np.empty(len(weights), dtype = np.int64)
+    for start in range(0, len(weights), batch_size):
+        w = weights[start:start + batch_size] * 64 
+        rounded = np.clip(np.rint(w).astype(np.int64), MIN_ENCODED, MAX_ENCODED) # weights outside of the 7 bit range saturate 
+        candidates = rounded[:, None, :] + offsets[None, :, :] # (batch, candidates, 5) 
+        out_of_range = ((candidates < MIN_ENCODED) | (candidates > MAX_ENCODED)).any(axis = 2)
+        violation = np.zeros(out_of_range.shape, dtype = np.int64) if target_sum is None else np.abs(candidates.sum(axis = 2) - target_sum)
+        error = np.square(candidates - w[:, None, :]).sum(axis = 2) / 64**2
+
+        # lexicographic score: range, then sum constraint, then quantization error 
+        score = np.lexsort((error, violation, out_of_range), axis = -1)[:, 0]
+        rows = np.arange(len(w))
+        signed[start:start + batch_size] = candidates[rows, score]
+        violations[start:start + batch_size] = violation[rows, score]
+
+    encoded = np.where(signed < 0, signed + 128, signed) # 7 bit two's complement, as decimal_to_encoded 
+    if(single_set):
+        return encoded[0], violations[0]
+    return encoded, violations
+
 # Scan a range of encoded values to see what decimal values you would get (seems slightly different from actual encoding for larger values)
 def ScanValues(min, max):
     encoded_vals = []
@@ -69,10 +136,21 @@ def ScanValues(min, max):
 
 if (__name__ == '__main__'): 
 
+    args = GetOptions()
+    DecimalWeights = [float(w_) for w_ in args.DecimalWeights.split(',')]
+    N_weights = len(DecimalWeights)
+    if(N_weights != N_WEIGHTS):
+        raise Exception("Number of weights must equal 5 - Exiting")
+
     # Start with a set of decimal weights and obtain their encoded values 
     EncodedWeights = decimal_to_encoded(DecimalWeights)
     print("Decimal weights (ideally in steps of 1/64):",DecimalWeights)
     print("Sum of decimal weights:",np.sum(DecimalWeights)) 
     print("Encoded weights:",EncodedWeights)
     print("Sum of decimal weights:",np.sum(EncodedWeights)) 
+
+    # Closest encoding whose signed weights sum to 0 
+    ConstrainedWeights, violation = best_encoded_weights(DecimalWeights, target_sum = 0)
+    print("Encoded weights with sum 0:",ConstrainedWeights.tolist(), "" if violation == 0 else "(sum off by %s)"%(violation))
+    print("Corresponding decimal weights:",encoded_to_decimal_array(ConstrainedWeights).tolist())
     print("DONE")